@@ -1,4 +1,3 @@
-
 """
 🤖 AI vs Traditional Network Routing Simulator
 Single file implementation using Python + Streamlit
@@ -11,75 +10,646 @@ Author: College AI Project Team
 import streamlit as st
 import networkx as nx
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 import random
+import heapq
+import itertools
+import json
+import logging
+import math
 import pandas as pd
 import numpy as np
-from collections import defaultdict
+from array import array
+from collections import OrderedDict, defaultdict
+from multiprocessing import shared_memory
+import multiprocessing
+import os
+import threading
 import time
+import weakref
+from functools import wraps
+
+# Congested links cost this many times their base cost
+CONGESTION_MULTIPLIER = 3
+
+# Debug channel for routing decisions (logging.getLogger('routing').setLevel(logging.DEBUG))
+log = logging.getLogger('routing')
 
 # =============================================================================
-# 1. NETWORK TOPOLOGY CLASS
+# 0. INSTRUMENTATION
 # =============================================================================
 
-class NetworkTopology:
-    """Simple 6-node network for demonstration"""
+class Metrics:
+    """Opt-in hot-path counters and per-call timers for the routers.
+
+    Disabled by default: instrumented calls then cost one attribute check,
+    and counters are only tallied once per call, never per inner-loop step.
+    """
 
     def __init__(self):
-        # 6 nodes for simplicity
-        self.nodes = ['A', 'B', 'C', 'D', 'E', 'F']
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        """Zero every counter and timer"""
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(lambda: [0, 0.0, 0.0])  # call -> [count, total, max]
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def observe(self, call, seconds):
+        timer = self.timers[call]
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds)
+
+    def to_dict(self):
+        """Counters and timers as plain JSON-serializable data"""
+        return {
+            'counters': dict(self.counters),
+            'timers': {call: {'count': count, 'total_seconds': total, 'max_seconds': worst}
+                       for call, (count, total, worst) in self.timers.items()},
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix='routing'):
+        """Counters and timers in the Prometheus text exposition format"""
+        lines = [f"# TYPE {prefix}_events_total counter"]
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        lines.append(f"# TYPE {prefix}_call_seconds summary")
+        for call, (count, total, _) in sorted(self.timers.items()):
+            lines.append(f'{prefix}_call_seconds_count{{call="{call}"}} {count}')
+            lines.append(f'{prefix}_call_seconds_sum{{call="{call}"}} {total}')
+        lines.append(f"# TYPE {prefix}_call_seconds_max gauge")
+        for call, (_, _, worst) in sorted(self.timers.items()):
+            lines.append(f'{prefix}_call_seconds_max{{call="{call}"}} {worst}')
+        return "\n".join(lines) + "\n"
+
+# Process-wide instrumentation; set METRICS.enabled = True to start collecting
+METRICS = Metrics()
+
+def instrumented(method):
+    """Time a router method under '<Class>.<method>' while METRICS is enabled"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not METRICS.enabled:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            METRICS.observe(f"{type(self).__name__}.{method.__name__}",
+                            time.perf_counter() - start)
+    return wrapper
 
-        # Network connections with costs
-        self.edges = [
-            ('A', 'B', 10), ('A', 'C', 15), ('A', 'E', 12),
-            ('B', 'D', 10), ('B', 'F', 20),
-            ('C', 'D', 12), ('C', 'E', 8),
-            ('D', 'F', 15), ('E', 'F', 18)
-        ]
+# =============================================================================
+# 1. NETWORK TOPOLOGY CLASS
+# =============================================================================
+
+class NetworkTopology:
+    """Simple 6-node network for demonstration (or any given nodes/edges)"""
+
+    def __init__(self, nodes=None, edges=None):
+        if edges is None:
+            # 6 nodes for simplicity
+            nodes = ['A', 'B', 'C', 'D', 'E', 'F']
+
+            # Network connections with costs
+            edges = [
+                ('A', 'B', 10), ('A', 'C', 15), ('A', 'E', 12),
+                ('B', 'D', 10), ('B', 'F', 20),
+                ('C', 'D', 12), ('C', 'E', 8),
+                ('D', 'F', 15), ('E', 'F', 18)
+            ]
+        self.nodes = list(nodes or [])
+        self.edges = list(edges)
 
         # Track congestion status
         self.congestion = set()
 
+        # Continuous per-link cost multipliers, aligned with get_link_arrays()
+        # slots; None until set_link_loads() is first called
+        self._link_load = None
+        self._load_layout = None  # Link arrays _link_load is aligned with
+
+        # Bumped on every link or congestion change; used to invalidate caches
+        self.version = 0
+        self.links_version = 0  # Only bumped when nodes or links change
+        self._link_arrays = None
+        self._link_slot = None  # node -> {neighbor: slot}, built on demand
+        self._cost_array = None
+
+        # Callbacks (node1, node2) fired whenever a link's cost changes
+        self.listeners = []
+
+        # Adjacency index: node -> {neighbor: base cost}, kept in sync with edges
+        self.node_ids = {}
+        self.adjacency = {}
+        self._build_index()
+
+    def _build_index(self):
+        """Rebuild node IDs and adjacency index from the edge list"""
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+        self.adjacency = adjacency = {node: {} for node in self.nodes}
+        for u, v, cost in self.edges:
+            if u not in adjacency or v not in adjacency:
+                self._index_edge(u, v, cost)  # Slow path: registers new nodes
+            else:
+                adjacency[u][v] = cost
+                adjacency[v][u] = cost
+
+    def _index_edge(self, node1, node2, cost):
+        """Add one undirected edge to the adjacency index"""
+        self.add_node(node1)
+        self.add_node(node2)
+        self.adjacency[node1][node2] = cost
+        self.adjacency[node2][node1] = cost
+
+    def add_node(self, node):
+        """Add an isolated node"""
+        if node not in self.adjacency:
+            self.node_ids[node] = len(self.nodes)
+            self.nodes.append(node)
+            self.adjacency[node] = {}
+            self._links_changed()
+
+    def add_link(self, node1, node2, cost):
+        """Add a link, or update its base cost if it already exists"""
+        if node2 in self.adjacency.get(node1, {}):
+            self.edges = [(u, v, cost) if {u, v} == {node1, node2} else (u, v, c)
+                          for u, v, c in self.edges]
+        else:
+            self.edges.append((node1, node2, cost))
+        self._index_edge(node1, node2, cost)
+        self._links_changed(node1, node2)
+
+    def remove_link(self, node1, node2):
+        """Remove a link (and any congestion on it)"""
+        self.edges = [(u, v, c) for u, v, c in self.edges
+                      if {u, v} != {node1, node2}]
+        self.adjacency.get(node1, {}).pop(node2, None)
+        self.adjacency.get(node2, {}).pop(node1, None)
+        self.congestion.discard((node1, node2))
+        self.congestion.discard((node2, node1))
+        self._links_changed(node1, node2)
+
+    def subscribe(self, callback):
+        """Register callback(node1, node2), called after a link's cost changes"""
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """Stop sending change notifications to callback"""
+        self.listeners.remove(callback)
+
+    def _notify(self, node1, node2):
+        """Tell listeners that the link node1-node2 changed"""
+        for callback in list(self.listeners):
+            callback(node1, node2)
+
+    def _links_changed(self, node1=None, node2=None):
+        """Invalidate cached arrays after a structural change"""
+        self.version += 1
+        self.links_version += 1
+        self._link_arrays = None
+        self._link_slot = None
+        self._cost_array = None
+        if node1 is not None:
+            self._notify(node1, node2)
+
     def reset_congestion(self):
         """Clear all congestion"""
+        links = {tuple(sorted(link)) for link in self.congestion}
         self.congestion.clear()
+        self._congestion_changed(links)
 
     def add_congestion(self, node1, node2):
         """Add congestion to a link (both directions)"""
+        if (node1, node2) in self.congestion:
+            return
         self.congestion.add((node1, node2))
         self.congestion.add((node2, node1))
+        self._congestion_changed([(node1, node2)])
 
     def remove_congestion(self, node1, node2):
         """Remove congestion from a link"""
+        if (node1, node2) not in self.congestion:
+            return
         self.congestion.discard((node1, node2))
         self.congestion.discard((node2, node1))
+        self._congestion_changed([(node1, node2)])
+
+    def _congestion_changed(self, links):
+        """Invalidate cached costs and notify listeners after a congestion change"""
+        self.version += 1
+        self._cost_array = None
+        for node1, node2 in links:
+            self._notify(node1, node2)
 
     def get_base_cost(self, node1, node2):
         """Get base cost between two nodes"""
-        for u, v, cost in self.edges:
-            if (u == node1 and v == node2) or (v == node1 and u == node2):
-                return cost
-        return float('inf')
+        return self.adjacency.get(node1, {}).get(node2, float('inf'))
 
     def get_actual_cost(self, node1, node2):
-        """Get actual cost considering congestion"""
+        """Get actual cost considering congestion and link load"""
         base_cost = self.get_base_cost(node1, node2)
         if base_cost == float('inf'):
             return float('inf')
 
+        if self._link_load is not None:
+            if self._link_slot is None:
+                # Slot order matches get_link_arrays(): adjacency order
+                self._link_slot = {node: {neighbor: k for k, neighbor in enumerate(neighbors)}
+                                   for node, neighbors in self.adjacency.items()}
+            slot = self._link_slot[node1][node2]
+            base_cost = base_cost * float(self.get_link_loads()[self.node_ids[node1], slot])
+
         # Congested links cost 3x more
         if (node1, node2) in self.congestion:
-            return base_cost * 3
+            return base_cost * CONGESTION_MULTIPLIER
         return base_cost
 
     def get_neighbors(self, node):
         """Get all neighboring nodes"""
-        neighbors = []
-        for u, v, _ in self.edges:
-            if u == node:
-                neighbors.append(v)
-            elif v == node:
-                neighbors.append(u)
-        return neighbors
+        return list(self.adjacency.get(node, ()))
+
+    def get_link_arrays(self):
+        """Padded NumPy view of the adjacency index.
+
+        Returns (neighbors, base_costs, degrees) where neighbors[i, k] is the
+        ID of node i's k-th neighbor (-1 for padding) and base_costs[i, k] its
+        link cost (inf for padding). Slot order matches get_neighbors().
+        """
+        if self._link_arrays is None:
+            degrees = np.array([len(self.adjacency[node]) for node in self.nodes],
+                               dtype=np.int32)
+            width = max(int(degrees.max()) if len(degrees) else 0, 1)
+            neighbors = np.full((len(self.nodes), width), -1, dtype=np.int32)
+            base_costs = np.full((len(self.nodes), width), np.inf)
+            for i, node in enumerate(self.nodes):
+                for k, (neighbor, cost) in enumerate(self.adjacency[node].items()):
+                    neighbors[i, k] = self.node_ids[neighbor]
+                    base_costs[i, k] = cost
+            self._link_arrays = (neighbors, base_costs, degrees)
+        return self._link_arrays
+
+    def get_actual_cost_array(self):
+        """Per-slot actual costs (load and congestion applied), aligned with get_link_arrays()"""
+        if self._cost_array is None:
+            neighbors, base_costs, _ = self.get_link_arrays()
+            loads = self.get_link_loads()
+            costs = base_costs * loads if loads is not None else base_costs.copy()
+            for u, v in self.congestion:
+                if u in self.node_ids and v in self.node_ids:
+                    row = self.node_ids[u]
+                    slot = np.flatnonzero(neighbors[row] == self.node_ids[v])
+                    costs[row, slot] *= CONGESTION_MULTIPLIER
+            self._cost_array = costs
+        return self._cost_array
+
+    def link_slots(self, sources, targets):
+        """(rows, slots) of the directed links sources[k] -> targets[k] (node IDs)"""
+        neighbors, _, _ = self.get_link_arrays()
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        match = neighbors[sources] == targets[:, None]
+        found = match.any(axis=1) & (targets >= 0)
+        if not found.all():
+            k = int(np.flatnonzero(~found)[0])
+            raise ValueError(f"no link {self.nodes[sources[k]]}-{self.nodes[targets[k]]}")
+        return sources, match.argmax(axis=1)
+
+    def get_link_loads(self):
+        """Per-slot load factors aligned with get_link_arrays(), or None if never set"""
+        if self._link_load is None:
+            return None
+        neighbors, _, _ = self.get_link_arrays()
+        if self._load_layout is not neighbors:
+            # Links kept their load across a structural change; new links start at 1
+            loads = np.ones(neighbors.shape)
+            node, new_slot, old_slot = _matching_slots(self._load_layout, neighbors)
+            loads[node, new_slot] = self._link_load[node, old_slot]
+            self._link_load, self._load_layout = loads, neighbors
+        return self._link_load
+
+    def set_link_loads(self, sources, targets, loads, symmetric=True, notify=False):
+        """Bulk-set load factors (cost multipliers, 1 = nominal) by node ID arrays.
+
+        loads may be a scalar or one value per link. Costs seen by every
+        router change at once and version is bumped, so caches refresh; pass
+        notify=True to also call listeners for each link whose load moved.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        loads = np.broadcast_to(np.asarray(loads, dtype=np.float64), sources.shape)
+        if not (loads > 0).all():
+            raise ValueError("link loads must be positive")
+        if symmetric:
+            sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+            loads = np.concatenate([loads, loads])
+
+        rows, slots = self.link_slots(sources, targets)
+        current = self.get_link_loads()
+        if current is None:
+            neighbors, _, _ = self.get_link_arrays()
+            current = self._link_load = np.ones(neighbors.shape)
+            self._load_layout = neighbors
+        changed = current[rows, slots] != loads
+        current[rows, slots] = loads
+
+        self.version += 1
+        self._cost_array = None
+        if notify and self.listeners:
+            for u, v in {_link_key(int(u), int(v))
+                         for u, v in zip(rows[changed], targets[changed])}:
+                self._notify(self.nodes[u], self.nodes[v])
+
+    def reset_link_loads(self):
+        """Return every link to its nominal (load 1) cost"""
+        if self._link_load is not None:
+            self._link_load = self._load_layout = None
+            self.version += 1
+            self._cost_array = None
+
+def _matching_slots(old_neighbors, neighbors):
+    """(node, new_slot, old_slot) of links present in both link-array layouts"""
+    # Nodes are only ever appended, so IDs are stable; match slots by neighbor ID
+    rows = neighbors[:old_neighbors.shape[0]]
+    same = (rows[:, :, None] == old_neighbors[:, None, :]) & (rows[:, :, None] >= 0)
+    return np.nonzero(same)
+
+# Files written by save_topology() for the compact binary format
+TOPOLOGY_ARRAYS = ('nodes.npy', 'links.npy', 'costs.npy', 'congested.npy')
+
+def load_topology(path, **options):
+    """Load a NetworkTopology from CSV, GraphML or a binary topology directory"""
+    if os.path.isdir(path):
+        return load_topology_binary(path)
+    if path.endswith('.graphml'):
+        return load_topology_graphml(path, **options)
+    return load_topology_csv(path, **options)
+
+def save_topology(network, path):
+    """Save a NetworkTopology; the format follows load_topology()'s rules.
+
+    Only the binary directory format keeps the congestion state.
+    """
+    if path.endswith('.graphml'):
+        G = nx.Graph()
+        G.add_nodes_from(network.nodes)
+        G.add_weighted_edges_from(network.edges, weight='cost')
+        nx.write_graphml(G, path)
+    elif path.endswith('.csv'):
+        pd.DataFrame(network.edges, columns=['source', 'target', 'cost']).to_csv(path, index=False)
+    else:
+        save_topology_binary(network, path)
+
+def load_topology_csv(path, source='source', target='target', cost='cost',
+                      chunksize=1_000_000):
+    """Stream an edge-list CSV in chunks, interning node names to integer IDs.
+
+    The cost column is optional (every link costs 1 without it).
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [source, target] + ([cost] if cost in header else [])
+    names = {}  # node name -> ID
+    sources, targets, costs = [], [], []
+
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize,
+                             dtype={source: str, target: str}):
+        for name in pd.unique(chunk[[source, target]].to_numpy().ravel()):
+            if name not in names:
+                names[name] = len(names)
+        sources.append(chunk[source].map(names).to_numpy(np.int64))
+        targets.append(chunk[target].map(names).to_numpy(np.int64))
+        costs.append(chunk[cost].to_numpy() if cost in header
+                     else np.ones(len(chunk), dtype=np.int64))
+
+    if not sources:
+        return NetworkTopology([], [])
+    return _topology_from_arrays(list(names), np.concatenate(sources),
+                                 np.concatenate(targets), np.concatenate(costs))
+
+def load_topology_graphml(path, cost='cost', default_cost=1):
+    """Load a GraphML file (directed graphs are treated as undirected)"""
+    G = nx.read_graphml(path)
+    if G.is_directed():
+        G = G.to_undirected()
+    edges = [(u, v, data.get(cost, default_cost)) for u, v, data in G.edges(data=True)]
+    return NetworkTopology(list(G.nodes), [edge for edge in edges if edge[0] != edge[1]])
+
+def save_topology_binary(network, path):
+    """Write the topology as .npy arrays in directory path for fast mmap reload"""
+    os.makedirs(path, exist_ok=True)
+    ids = network.node_ids
+    links = np.array([(ids[u], ids[v]) for u, v, _ in network.edges],
+                     dtype=np.int32).reshape(-1, 2)
+    congested = np.array([(u, v) in network.congestion for u, v, _ in network.edges],
+                         dtype=bool)
+    arrays = (np.array(network.nodes, dtype=str),
+              links,
+              np.array([cost for _, _, cost in network.edges]),
+              congested)
+    for name, values in zip(TOPOLOGY_ARRAYS, arrays):
+        np.save(os.path.join(path, name), values)
+
+def load_topology_binary(path):
+    """Load a directory written by save_topology_binary().
+
+    The arrays are memory-mapped and the link arrays are built straight from
+    them; only the edge list and adjacency index are Python objects.
+    """
+    nodes, links, costs, congested = [
+        np.load(os.path.join(path, name), mmap_mode='r') for name in TOPOLOGY_ARRAYS]
+    network = _topology_from_arrays(nodes.tolist(), links[:, 0], links[:, 1], costs,
+                                    deduplicate=False)
+    for i in np.flatnonzero(congested):
+        u, v, _ = network.edges[i]
+        network.congestion.add((u, v))
+        network.congestion.add((v, u))
+    return network
+
+def _topology_from_arrays(names, sources, targets, costs, deduplicate=True):
+    """Build a NetworkTopology from interned integer edge arrays.
+
+    With deduplicate, self-loops are dropped and only the first of any
+    repeated undirected link is kept.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    costs = np.asarray(costs)
+    if deduplicate and len(sources):
+        low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+        _, first = np.unique(low * len(names) + high, return_index=True)
+        keep = np.sort(first[low[first] != high[first]])
+        sources, targets, costs = sources[keep], targets[keep], costs[keep]
+
+    lookup = np.array(names, dtype=object)
+    edges = list(zip(lookup[sources].tolist(), lookup[targets].tolist(), costs.tolist()))
+    network = NetworkTopology(names, edges)
+    if deduplicate or not _has_repeated_links(len(names), sources, targets):
+        network._link_arrays = _link_arrays_from_edges(len(names), sources, targets, costs)
+    return network
+
+def _has_repeated_links(num_nodes, sources, targets):
+    """Whether any undirected link appears more than once in the edge arrays"""
+    low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+    return len(np.unique(low * num_nodes + high)) < len(sources)
+
+def _link_arrays_from_edges(num_nodes, sources, targets, costs):
+    """NetworkTopology.get_link_arrays() computed from edge arrays.
+
+    A node's slots follow the order its links appear in, as in the
+    adjacency index NetworkTopology builds from the same edge list.
+    """
+    # Both directions of edge i sit at 2i and 2i + 1; self-loops get one slot
+    arc_sources = np.column_stack([sources, targets]).ravel()
+    arc_targets = np.column_stack([targets, sources]).ravel()
+    arc_costs = np.repeat(np.asarray(costs, dtype=np.float64), 2)
+    keep = np.ones(len(arc_sources), dtype=bool)
+    keep[1::2] = sources != targets
+    arc_sources, arc_targets, arc_costs = arc_sources[keep], arc_targets[keep], arc_costs[keep]
+
+    order = np.argsort(arc_sources, kind='stable')
+    rows = arc_sources[order]
+    degrees = np.bincount(arc_sources, minlength=num_nodes).astype(np.int32)
+    starts = np.cumsum(degrees) - degrees
+    slots = np.arange(len(order)) - starts[rows]
+
+    width = max(int(degrees.max()) if num_nodes else 0, 1)
+    neighbors = np.full((num_nodes, width), -1, dtype=np.int32)
+    base_costs = np.full((num_nodes, width), np.inf)
+    neighbors[rows, slots] = arc_targets[order]
+    base_costs[rows, slots] = arc_costs[order]
+    return neighbors, base_costs, degrees
+
+# Synthetic topologies for benchmarks and experiments
+
+def grid_graph(num_nodes, rng):
+    """Square 2D grid with about num_nodes nodes"""
+    side = max(2, math.ceil(math.sqrt(num_nodes)))
+    return nx.grid_2d_graph(side, side)
+
+def random_geometric_graph(num_nodes, rng):
+    """Random geometric graph with a radius just above the connectivity threshold"""
+    radius = min(1.0, 1.5 * math.sqrt(math.log(max(num_nodes, 2)) / (math.pi * num_nodes)))
+    return nx.random_geometric_graph(num_nodes, radius, seed=rng.randrange(2**32))
+
+def barabasi_albert_graph(num_nodes, rng):
+    """Scale-free preferential-attachment graph"""
+    return nx.barabasi_albert_graph(max(num_nodes, 3), 2, seed=rng.randrange(2**32))
+
+def fat_tree_graph(num_nodes, rng):
+    """k-ary fat-tree (core, aggregation, edge and host layers) with >= num_nodes nodes"""
+    k = 2
+    while 5 * k * k // 4 + k ** 3 // 4 < num_nodes:
+        k += 2
+    half = k // 2
+    G = nx.Graph()
+    for pod in range(k):
+        for a in range(half):
+            agg = ('agg', pod, a)
+            # Each aggregation switch connects to half of the core switches
+            for c in range(half):
+                G.add_edge(agg, ('core', a * half + c))
+            for e in range(half):
+                edge = ('edge', pod, e)
+                G.add_edge(agg, edge)
+                if a == 0:
+                    for h in range(half):
+                        G.add_edge(edge, ('host', pod, e, h))
+    return G
+
+TOPOLOGIES = {
+    'grid': grid_graph,
+    'rgg': random_geometric_graph,
+    'ba': barabasi_albert_graph,
+    'fattree': fat_tree_graph,
+}
+
+def build_topology(kind, num_nodes, rng, congestion=0.0):
+    """Build a NetworkTopology with random integer link costs and congestion.
+
+    kind is one of TOPOLOGIES; rng is a random.Random. Shared by the
+    benchmark, sweep and training command-line tools.
+    """
+    G = TOPOLOGIES[kind](num_nodes, rng)
+    G = nx.convert_node_labels_to_integers(G)
+    nodes = [f"n{i}" for i in G.nodes]
+    edges = [(f"n{u}", f"n{v}", rng.randint(1, 20)) for u, v in G.edges]
+    network = NetworkTopology(nodes, edges)
+    for u, v, _ in edges:
+        if rng.random() < congestion:
+            network.add_congestion(u, v)
+    return network
+
+class LinkLoadSeries:
+    """Time series of link load factors for playback onto a NetworkTopology.
+
+    values[t, k] is the load factor of link k (sources[k]-targets[k], node
+    IDs, both directions) from times[t] until the next sample. Each sample
+    is applied with one set_link_loads() call.
+    """
+
+    def __init__(self, sources, targets, times, values):
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        if self.values.shape != (len(self.times), len(self.sources)):
+            raise ValueError("values must have one row per time and one column per link")
+
+    @classmethod
+    def random_walk(cls, network, steps, interval=1.0, volatility=0.2,
+                    max_load=CONGESTION_MULTIPLIER, seed=None):
+        """Synthetic series: every link's load drifts in log space between 1 and max_load"""
+        ids = network.node_ids
+        sources = np.array([ids[u] for u, _, _ in network.edges], dtype=np.int64)
+        targets = np.array([ids[v] for _, v, _ in network.edges], dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        shocks = rng.normal(0, volatility, (steps, len(sources)))
+        log_load = np.empty_like(shocks)
+        level = np.zeros(len(sources))
+        for t in range(steps):
+            level = np.clip(level + shocks[t], 0, np.log(max_load))
+            log_load[t] = level
+        return cls(sources, targets, np.arange(steps) * interval, np.exp(log_load))
+
+    def index(self, timestamp):
+        """Row of the sample in effect at timestamp (the first one before it starts)"""
+        return max(int(np.searchsorted(self.times, timestamp, side='right')) - 1, 0)
+
+    def apply(self, network, timestamp, notify=False):
+        """Set network's link loads to the sample in effect at timestamp; returns its row"""
+        row = self.index(timestamp)
+        network.set_link_loads(self.sources, self.targets, self.values[row], notify=notify)
+        return row
+
+    def play(self, network, notify=False):
+        """Apply each sample in turn, yielding its time after it is in effect"""
+        for row, timestamp in enumerate(self.times):
+            network.set_link_loads(self.sources, self.targets, self.values[row], notify=notify)
+            yield float(timestamp)
+
+    def save(self, path, network):
+        """Write the series to an .npz file, links stored by node name"""
+        nodes = np.array(network.nodes, dtype=str)
+        np.savez(path, sources=nodes[self.sources], targets=nodes[self.targets],
+                 times=self.times, values=self.values)
+
+    @classmethod
+    def load(cls, path, network):
+        """Load a series written by save() for network's nodes"""
+        with np.load(path) as data:
+            ids = network.node_ids
+            sources = [ids[node] for node in data['sources'].tolist()]
+            targets = [ids[node] for node in data['targets'].tolist()]
+            return cls(sources, targets, data['times'], data['values'])
 
 # =============================================================================
 # 2. TRADITIONAL DIJKSTRA ROUTING
@@ -88,41 +658,146 @@ class NetworkTopology:
 class TraditionalRouter:
     """Traditional Dijkstra routing - always shortest path by base distance"""
 
-    def __init__(self, network):
+    def __init__(self, network, incremental=False):
         self.network = network
 
-    def find_shortest_path(self, source, destination):
-        """Find shortest path using Dijkstra algorithm (ignores congestion)"""
-        distances = {node: float('inf') for node in self.network.nodes}
-        distances[source] = 0
-        previous = {}
-        unvisited = set(self.network.nodes)
+        # Incremental mode keeps one shortest-path tree per source and
+        # repairs it in place when a link changes, instead of rerunning Dijkstra
+        self.incremental = incremental
+        self.trees = {}  # source -> (distances, previous)
+        if incremental:
+            network.subscribe(self.on_link_change)
 
-        while unvisited:
-            # Get node with minimum distance
-            current = min(unvisited, key=lambda x: distances[x])
+    def find_path(self, source, destination):
+        """Common routing entry point shared by all routers"""
+        return self.find_shortest_path(source, destination)
 
-            if distances[current] == float('inf'):
-                break  # No more reachable nodes
-
-            unvisited.remove(current)
-
-            # Check all neighbors
-            for neighbor in self.network.get_neighbors(current):
-                if neighbor in unvisited:
-                    # Use BASE cost only (ignore congestion)
-                    base_cost = self.network.get_base_cost(current, neighbor)
-                    alternative = distances[current] + base_cost
+    @instrumented
+    def find_shortest_path(self, source, destination):
+        """Find shortest path using Dijkstra algorithm (ignores congestion)"""
+        if self.incremental:
+            if source not in self.trees:
+                self.trees[source] = self._dijkstra(source)
+            _, previous = self.trees[source]
+        else:
+            _, previous = self._dijkstra(source, destination)
+        path = self.build_path(previous, source, destination)
+        log.debug("dijkstra %s -> %s: %s", source, destination, path)
+        return path
 
-                    if alternative < distances[neighbor]:
-                        distances[neighbor] = alternative
-                        previous[neighbor] = current
+    @instrumented
+    def on_link_change(self, node1, node2):
+        """Repair every cached shortest-path tree after node1-node2 changed"""
+        for distances, previous in self.trees.values():
+            self._repair_tree(distances, previous, node1, node2)
+        if METRICS.enabled:
+            METRICS.count('tree_repairs', len(self.trees))
+
+    def _repair_tree(self, distances, previous, node1, node2):
+        """Dynamic shortest-path update touching only the affected region"""
+        cost = self.network.get_base_cost(node1, node2)
+
+        # Find the endpoint (if any) that hangs off this link in the tree
+        parent, child = None, None
+        if previous.get(node2) == node1:
+            parent, child = node1, node2
+        elif previous.get(node1) == node2:
+            parent, child = node2, node1
+
+        heap = []
+        if child is not None and distances[parent] + cost > distances[child]:
+            # Tree link got worse or disappeared: drop the subtree below it
+            # and re-attach each node through its best neighbor outside it
+            subtree = {child}
+            stack = [child]
+            while stack:
+                node = stack.pop()
+                for neighbor in self.network.adjacency[node]:
+                    if previous.get(neighbor) == node and neighbor not in subtree:
+                        subtree.add(neighbor)
+                        stack.append(neighbor)
+            for node in subtree:
+                distances.pop(node, None)
+                previous.pop(node, None)
+            for node in subtree:
+                for neighbor, base_cost in self.network.adjacency[node].items():
+                    if neighbor in distances and neighbor not in subtree:
+                        alternative = distances[neighbor] + base_cost
+                        if alternative < distances.get(node, float('inf')):
+                            distances[node] = alternative
+                            previous[node] = neighbor
+            heap = [(distances[node], node) for node in subtree if node in distances]
+            heapq.heapify(heap)
+        else:
+            # New or cheaper link: it can only shorten paths through it
+            for u, v in ((node1, node2), (node2, node1)):
+                if u in distances and distances[u] + cost < distances.get(v, float('inf')):
+                    distances[v] = distances[u] + cost
+                    previous[v] = u
+                    heapq.heappush(heap, (distances[v], v))
+
+        # Propagate improvements outward from the repaired nodes
+        while heap:
+            distance, current = heapq.heappop(heap)
+            if distance > distances[current]:
+                continue  # Stale heap entry
+            for neighbor, base_cost in self.network.adjacency[current].items():
+                alternative = distance + base_cost
+                if alternative < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = alternative
+                    previous[neighbor] = current
+                    heapq.heappush(heap, (alternative, neighbor))
+
+    def shortest_path_tree(self, source):
+        """Run Dijkstra once from source to every node.
+
+        Returns (distances, previous) for all reachable nodes; use
+        build_path() to extract the route to any destination.
+        """
+        return self._dijkstra(source)
+
+    def _dijkstra(self, source, destination=None):
+        """Heap-based Dijkstra on base costs, stopping early at destination"""
+        distances = {source: 0}
+        previous = {}
+        settled = set()
+        heap = [(0, source)]
+        pops = 0
 
-        # Debugging output
-        print(f"Distances: {distances}")
-        print(f"Previous mapping: {previous}")
+        while heap:
+            distance, current = heapq.heappop(heap)
+            pops += 1
+            if current in settled:
+                continue  # Stale heap entry
+            settled.add(current)
 
-        # Reconstruct path
+            if current == destination:
+                break  # Destination settled, no need to explore further
+
+            # Use BASE cost only (ignore congestion)
+            for neighbor, base_cost in self.network.adjacency[current].items():
+                if neighbor in settled:
+                    continue
+                alternative = distance + base_cost
+                if alternative < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = alternative
+                    previous[neighbor] = current
+                    heapq.heappush(heap, (alternative, neighbor))
+
+        if METRICS.enabled:
+            # Every settled node but an early-exit destination had its links scanned
+            scanned = len(settled) - (destination in settled)
+            METRICS.count('dijkstra_runs')
+            METRICS.count('heap_pops', pops)
+            METRICS.count('heap_pushes', pops + len(heap))
+            METRICS.count('neighbor_lookups', scanned)
+            METRICS.count('cost_lookups', sum(len(self.network.adjacency[node])
+                                              for node in settled if node != destination))
+        return distances, previous
+
+    @staticmethod
+    def build_path(previous, source, destination):
+        """Reconstruct a path from a Dijkstra predecessor map"""
         path = []
         current = destination
         while current is not None:
@@ -137,21 +812,344 @@ class TraditionalRouter:
         else:
             return None
 
+def dijkstra_tree(graph, root):
+    """One-to-all Dijkstra over ID adjacency lists graph[node] = [(neighbor, cost), ...].
+
+    Returns (distance, previous, via) lists indexed by node ID, where
+    via[node] is the position of the link used in graph[previous[node]];
+    nodes root cannot reach get inf, -1 and -1.
+    """
+    distance = [float('inf')] * len(graph)
+    previous = [-1] * len(graph)
+    via = [-1] * len(graph)
+    distance[root] = 0
+    heap = [(0, root)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > distance[node]:
+            continue  # Stale heap entry
+        for k, (neighbor, cost) in enumerate(graph[node]):
+            alternative = d + cost
+            if alternative < distance[neighbor]:
+                distance[neighbor] = alternative
+                previous[neighbor] = node
+                via[neighbor] = k
+                heapq.heappush(heap, (alternative, neighbor))
+    return distance, previous, via
+
+class PathEngine:
+    """Point-to-point path search on base or actual (congestion and load) costs.
+
+    weight='base' matches TraditionalRouter; weight='actual' follows
+    get_actual_cost_array(), giving a congestion-aware baseline. method
+    picks the search behind shortest_path()/find_path(): 'dijkstra',
+    'bidirectional', or 'alt' (A* with landmark lower bounds). Searches run
+    on node IDs over adjacency lists rebuilt only when the costs change;
+    last_settled is the number of nodes the latest search settled.
+    """
+
+    METHODS = ('dijkstra', 'bidirectional', 'alt')
+
+    def __init__(self, network, weight='base', method='bidirectional', landmarks=8):
+        if weight not in ('base', 'actual'):
+            raise ValueError(f"unknown weight {weight!r}")
+        if method not in self.METHODS:
+            raise ValueError(f"unknown method {method!r}")
+        self.network = network
+        self.weight = weight
+        self.method = method
+        self.landmarks = landmarks
+        self.last_settled = 0
+
+        self._forward = self._reverse = None  # node ID -> [(neighbor ID, cost)]
+        self._graph_version = None
+        self._scale = 1.0  # Lower bound of cost / base cost over all links
+        self._landmark_rows = None  # node ID -> base distance to each landmark
+        self._landmark_version = None
+
+    def find_path(self, source, destination):
+        """Common routing entry point shared by all routers"""
+        return self.shortest_path(source, destination)[0]
+
+    @instrumented
+    def shortest_path(self, source, destination):
+        """(path, cost) from source to destination, or (None, inf)"""
+        ids = self.network.node_ids
+        cost, path = self._point_to_point(ids[source], ids[destination])
+        if METRICS.enabled:
+            METRICS.count('settled_nodes', self.last_settled)
+        return self._names(path), cost
+
+    @instrumented
+    def k_shortest_paths(self, source, destination, k):
+        """Yen's algorithm: up to k loopless (path, cost) pairs, cheapest first"""
+        ids = self.network.node_ids
+        target = ids[destination]
+        cost, path = self._point_to_point(ids[source], target)
+        if path is None:
+            return []
+        forward, _ = self._graph()
+        heuristic = self._heuristic(target) if self.method == 'alt' else None
+        accepted = [(cost, path)]
+        candidates = []
+        seen = {tuple(path)}
+
+        while len(accepted) < k:
+            _, last = accepted[-1]
+            root_cost = 0
+            for i in range(len(last) - 1):
+                spur, root = last[i], last[:i + 1]
+                # Leave the root path and every accepted continuation of it
+                banned_links = {(p[i], p[i + 1]) for _, p in accepted if p[:i + 1] == root}
+                spur_cost, spur_path = self._search(spur, target, heuristic,
+                                                    set(root[:-1]), banned_links)
+                if spur_path is not None:
+                    candidate = root[:-1] + spur_path
+                    if tuple(candidate) not in seen:
+                        seen.add(tuple(candidate))
+                        heapq.heappush(candidates, (root_cost + spur_cost, candidate))
+                root_cost += next(c for v, c in forward[spur] if v == last[i + 1])
+            if not candidates:
+                break
+            accepted.append(heapq.heappop(candidates))
+
+        return [(self._names(path), cost) for cost, path in accepted]
+
+    def prepare_landmarks(self, count=None):
+        """Pick landmarks by farthest-point sampling and store base-cost distances.
+
+        Base distances bound actual ones from below (scaled by the smallest
+        load factor), so congestion and load changes never invalidate them;
+        only structural changes trigger a rebuild. Returns the distances as
+        a [landmark, node] array.
+        """
+        count = self.landmarks if count is None else count
+        neighbors, base_costs, degrees = self.network.get_link_arrays()
+        graph = [list(zip(neighbors[i, :d].tolist(), base_costs[i, :d].tolist()))
+                 for i, d in enumerate(degrees.tolist())]
+        num_nodes = len(graph)
+        distances = np.full((count, num_nodes), np.inf)
+        nearest = np.full(num_nodes, np.inf)  # Distance to the closest landmark so far
+        landmark = 0
+        for row in range(min(count, num_nodes)):
+            distances[row] = dijkstra_tree(graph, landmark)[0]
+            nearest = np.minimum(nearest, distances[row])
+            landmark = int(np.argmax(nearest))  # inf first: unreached components
+        self._landmark_rows = distances.T.tolist()
+        self._landmark_version = self.network.links_version
+        return distances
+
+    def _graph(self):
+        """Forward and reverse adjacency lists for the current costs"""
+        version = (self.network.version if self.weight == 'actual'
+                   else self.network.links_version)
+        if self._graph_version != version:
+            neighbors, base_costs, degrees = self.network.get_link_arrays()
+            costs = base_costs
+            if self.weight == 'actual':
+                costs = self.network.get_actual_cost_array()
+                valid = neighbors >= 0
+                self._scale = float(min((costs[valid] / base_costs[valid]).min(initial=1.0), 1.0))
+            forward = [list(zip(neighbors[i, :d].tolist(), costs[i, :d].tolist()))
+                       for i, d in enumerate(degrees.tolist())]
+            reverse = [[] for _ in forward]
+            for node, links in enumerate(forward):
+                for neighbor, cost in links:
+                    reverse[neighbor].append((node, cost))
+            self._forward, self._reverse = forward, reverse
+            self._graph_version = version
+        return self._forward, self._reverse
+
+    def _heuristic(self, target):
+        """ALT lower bound on the cost from a node ID to target"""
+        if self._landmark_rows is None or self._landmark_version != self.network.links_version:
+            self.prepare_landmarks()
+        self._graph()  # Refreshes _scale
+        rows, scale = self._landmark_rows, self._scale
+        # Landmarks that cannot reach target say nothing about it
+        bounds = [(i, d) for i, d in enumerate(rows[target]) if d != float('inf')]
+
+        def heuristic(node):
+            row = rows[node]
+            return scale * max((abs(d - row[i]) for i, d in bounds), default=0)
+        return heuristic
+
+    def _point_to_point(self, source, target):
+        """(cost, path IDs) by the configured method"""
+        if self.method == 'bidirectional':
+            return self._bidirectional(source, target)
+        heuristic = self._heuristic(target) if self.method == 'alt' else None
+        return self._search(source, target, heuristic)
+
+    def _search(self, source, target, heuristic=None, banned_nodes=(), banned_links=()):
+        """Dijkstra, or A* with a consistent heuristic, avoiding the banned nodes and links"""
+        forward, _ = self._graph()
+        distances = {source: 0}
+        previous = {}
+        settled = set()
+        heap = [(heuristic(source) if heuristic else 0, 0, source)]
+
+        while heap:
+            _, distance, node = heapq.heappop(heap)
+            if node in settled:
+                continue  # Stale heap entry
+            settled.add(node)
+            if node == target:
+                break
+            for neighbor, cost in forward[node]:
+                if (neighbor in settled or neighbor in banned_nodes
+                        or (node, neighbor) in banned_links):
+                    continue
+                alternative = distance + cost
+                if alternative < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = alternative
+                    previous[neighbor] = node
+                    estimate = alternative + heuristic(neighbor) if heuristic else alternative
+                    heapq.heappush(heap, (estimate, alternative, neighbor))
+
+        self.last_settled = len(settled)
+        if target not in settled:
+            return float('inf'), None
+        return distances[target], self._unwind(previous, source, target)[::-1]
+
+    def _bidirectional(self, source, target):
+        """Dijkstra from both ends, stopping once the frontiers can't improve the best meeting"""
+        forward, reverse = self._graph()
+        graphs = (forward, reverse)
+        distances = ({source: 0}, {target: 0})
+        previous = ({}, {})
+        settled = (set(), set())
+        heaps = ([(0, source)], [(0, target)])
+        best, meeting = (0, source) if source == target else (float('inf'), None)
+
+        while heaps[0] and heaps[1] and heaps[0][0][0] + heaps[1][0][0] < best:
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            distance, node = heapq.heappop(heaps[side])
+            if node in settled[side]:
+                continue  # Stale heap entry
+            settled[side].add(node)
+            mine, other = distances[side], distances[1 - side]
+            for neighbor, cost in graphs[side][node]:
+                alternative = distance + cost
+                if alternative < mine.get(neighbor, float('inf')):
+                    mine[neighbor] = alternative
+                    previous[side][neighbor] = node
+                    heapq.heappush(heaps[side], (alternative, neighbor))
+                if neighbor in other and alternative + other[neighbor] < best:
+                    best, meeting = alternative + other[neighbor], neighbor
+
+        self.last_settled = len(settled[0]) + len(settled[1])
+        if meeting is None:
+            return float('inf'), None
+        path = self._unwind(previous[0], source, meeting)[::-1]
+        path += self._unwind(previous[1], target, meeting)[1:]
+        return distances[0][meeting] + distances[1][meeting], path
+
+    @staticmethod
+    def _unwind(previous, start, node):
+        """IDs from node back to start through a predecessor map"""
+        path = [node]
+        while node != start:
+            node = previous[node]
+            path.append(node)
+        return path
+
+    def _names(self, path):
+        return [self.network.nodes[i] for i in path] if path is not None else None
+
 
 # =============================================================================
 # 3. AI Q-LEARNING ROUTING
 # =============================================================================
 
+def _count_walk(steps, arrived, training):
+    """Tally METRICS counters for one training episode or greedy walk"""
+    # Each hop scans one neighbor row to choose; a training hop also reads
+    # a link cost, updates one Q-value and scans the next row unless it arrived
+    if training:
+        METRICS.count('episodes')
+        METRICS.count('q_updates', steps)
+        METRICS.count('cost_lookups', steps)
+        METRICS.count('neighbor_lookups', 2 * steps - arrived)
+    else:
+        METRICS.count('greedy_walks')
+        METRICS.count('neighbor_lookups', steps)
+
+def _offline_result(applied, skipped, max_delta):
+    """Summary of a train_offline() call"""
+    if METRICS.enabled:
+        METRICS.count('offline_transitions', applied)
+    log.debug("offline training: %d transitions applied, %d skipped", applied, skipped)
+    return {'transitions': applied, 'skipped': skipped, 'max_delta_q': float(max_delta)}
+
+def _save_snapshot(router, path, **arrays):
+    """Write arrays as .npy files plus router's params.json into directory path"""
+    os.makedirs(path, exist_ok=True)
+    arrays['nodes'] = np.array(router.network.nodes, dtype=str)
+    for name, values in arrays.items():
+        np.save(os.path.join(path, name + '.npy'), values)
+    params = {name: getattr(router, name) for name in router.SNAPSHOT_PARAMS}
+    params['backend'] = type(router).__name__
+    with open(os.path.join(path, 'params.json'), 'w') as f:
+        json.dump(params, f, indent=2)
+
+def _load_snapshot(cls, network, path, mmap_mode):
+    """Create a cls router with saved parameters and map its .npy files"""
+    with open(os.path.join(path, 'params.json')) as f:
+        params = json.load(f)
+    router = cls(network)
+    for name in cls.SNAPSHOT_PARAMS:
+        setattr(router, name, params[name])
+    arrays = {name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+              for name in os.listdir(path) if name.endswith('.npy')}
+    return router, arrays
+
+def _dijkstra_value_array(network, destination_id, discount_factor):
+    """Discounted return of following TraditionalRouter's route, per node ID.
+
+    Hops are rewarded as in QLearningRouter.get_reward(). The destination
+    itself is 0 (terminal) and nodes that cannot reach it are NaN.
+    """
+    nodes, ids = network.nodes, network.node_ids
+    distances, previous = TraditionalRouter(network).shortest_path_tree(nodes[destination_id])
+    values = np.full(len(nodes), np.nan)
+    values[destination_id] = 0
+    # Links are undirected, so a node's tree parent is its next hop
+    for node in sorted(distances, key=distances.get):
+        parent = previous.get(node)
+        if parent is None:
+            continue
+        arrived = ids[parent] == destination_id
+        values[ids[node]] = (-network.get_actual_cost(node, parent) + (100 if arrived else 0)
+                             + discount_factor * (0 if arrived else values[ids[parent]]))
+    return values
+
 class QLearningRouter:
     """AI router using Q-Learning algorithm"""
 
-    def __init__(self, network):
+    def __init__(self, network, incremental=False, transfer=False):
         self.network = network
         self.q_table = defaultdict(float)  # (state, action, destination) -> Q-value
         self.learning_rate = 0.1
         self.discount_factor = 0.9
         self.epsilon = 0.1  # Exploration rate
+        self.max_steps = 10  # Hop limit per episode / path walk
         self.training_episodes = 0
+        self.q_version = 0  # Bumped by every Q-value write; caches compare against it
+        self.last_episode = None  # Reward and max |ΔQ| of the latest episode
+        self.recorder = None  # Optional TransitionLog that training episodes append to
+
+        # Incremental mode re-plans Q-values around a changed link with
+        # prioritized sweeping instead of waiting for more training episodes
+        self.incremental = incremental
+        self.sweep_threshold = 0.01
+        self.sweep_budget = 1000
+
+        # Transfer mode keeps the table across topology changes and re-seeds
+        # the changed link's entries instead of leaving them to training
+        self.transfer = transfer
+        if incremental or transfer:
+            network.subscribe(self.on_link_change)
 
     def get_reward(self, current, next_node, destination):
         """Calculate reward for taking an action"""
@@ -211,15 +1209,49 @@ class QLearningRouter:
         )
 
         self.q_table[(state, action, destination)] = new_q
-
+        self.q_version += 1
+        return new_q - current_q
+
+    @instrumented
+    def train_offline(self, transitions, passes=1, chunk_size=1 << 20):
+        """Learn from a TransitionLog instead of stepping through the network.
+
+        Every recorded transition gets the update_q_value() update, in log
+        order, with its recorded reward. Transitions over links or nodes the
+        network no longer has are skipped. Returns counts of applied and
+        skipped transitions plus the largest |ΔQ|.
+        """
+        applied = skipped = 0
+        max_delta = 0
+        for _ in range(passes):
+            for chunk in transitions.read_chunks(chunk_size):
+                nodes = transitions.nodes
+                for state, action, next_state, destination, reward in chunk.tolist():
+                    state, action = nodes[state], nodes[action]
+                    next_state, destination = nodes[next_state], nodes[destination]
+                    if (self.network.get_base_cost(state, action) == float('inf')
+                            or destination not in self.network.adjacency):
+                        skipped += 1
+                        continue
+                    delta = self.update_q_value(state, action, reward, next_state, destination)
+                    max_delta = max(max_delta, abs(delta))
+                    applied += 1
+        return _offline_result(applied, skipped, max_delta)
+
+    @instrumented
     def train_episode(self, source, destination):
         """Train one episode"""
         current = source
         path = [current]
         visited = set()
-        max_steps = 10
-
-        for step in range(max_steps):
+        total_reward = 0
+        max_delta = 0
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.attach(self.network)
+            ids = self.network.node_ids
+
+        for step in range(self.max_steps):
             if current == destination:
                 break
 
@@ -235,25 +1267,37 @@ class QLearningRouter:
 
             # Get reward
             reward = self.get_reward(current, next_node, destination)
+            total_reward += reward
+            if recorder is not None:
+                recorder.record(ids[current], ids[next_node], reward,
+                                ids[next_node], ids[destination])
 
             # Update Q-value
-            self.update_q_value(current, next_node, reward, next_node, destination)
+            delta = self.update_q_value(current, next_node, reward, next_node, destination)
+            max_delta = max(max_delta, abs(delta))
 
             # Move to next state
             path.append(next_node)
             current = next_node
 
         self.training_episodes += 1
+        self.last_episode = {'reward': total_reward, 'max_delta_q': max_delta}
+        if METRICS.enabled:
+            _count_walk(len(path) - 1, current == destination, training=True)
         return path
 
+    def find_path(self, source, destination):
+        """Common routing entry point shared by all routers"""
+        return self.find_best_path(source, destination)
+
+    @instrumented
     def find_best_path(self, source, destination):
         """Find best path using learned Q-values (no exploration)"""
         current = source
         path = [current]
         visited = set()
-        max_steps = 10
 
-        for step in range(max_steps):
+        for step in range(self.max_steps):
             if current == destination:
                 break
 
@@ -270,77 +1314,1451 @@ class QLearningRouter:
             path.append(next_node)
             current = next_node
 
+        if METRICS.enabled:
+            _count_walk(len(path) - 1, current == destination, training=False)
+        log.debug("q-route %s -> %s: %s", source, destination, path)
         return path if current == destination else None
 
-# =============================================================================
-# 4. NETWORK VISUALIZATION
-# =============================================================================
+    def on_link_change(self, node1, node2):
+        """Network listener: re-seed and/or sweep Q-values of the changed link"""
+        if self.transfer:
+            self.seed_link(node1, node2)
+        if self.incremental:
+            self.sweep_link(node1, node2)
+
+    def dijkstra_values(self, destination):
+        """Discounted return of following TraditionalRouter's route to destination.
+
+        Returns {node: value} for every node that can reach destination,
+        with 0 at the destination itself (terminal).
+        """
+        values = _dijkstra_value_array(self.network, self.network.node_ids[destination],
+                                       self.discount_factor)
+        return {self.network.nodes[i]: float(values[i]) for i in np.flatnonzero(~np.isnan(values))}
+
+    def _seed_value(self, state, action, destination, next_value):
+        """Q(state, action) if the route continues with value next_value"""
+        if action == destination:
+            next_value = 0  # Terminal state
+        return self.get_reward(state, action, destination) + self.discount_factor * next_value
+
+    def _table_value(self, state, destination):
+        """max Q(state, ·) over learned entries, or None if there are none"""
+        values = [self.q_table[key] for key in
+                  ((state, neighbor, destination) for neighbor in self.network.get_neighbors(state))
+                  if key in self.q_table]
+        return max(values) if values else None
+
+    @instrumented
+    def warm_start(self, destinations=None, from_table=True, overwrite=False):
+        """Seed Q-values from Dijkstra routes instead of zeros.
+
+        Each (state, action, destination) entry gets the return of taking
+        action and then following TraditionalRouter's shortest path. With
+        from_table, a next state that already has learned entries for the
+        destination contributes its table value instead. Existing entries
+        are kept unless overwrite. Returns the number of entries set.
+        """
+        destinations = self.network.nodes if destinations is None else destinations
+        seeded = 0
+        for destination in destinations:
+            values = self.dijkstra_values(destination)
+            for state in self.network.nodes:
+                if state == destination:
+                    continue
+                for action in self.network.get_neighbors(state):
+                    key = (state, action, destination)
+                    if key in self.q_table and not overwrite:
+                        continue
+                    next_value = self._table_value(action, destination) if from_table else None
+                    if next_value is None:
+                        next_value = values.get(action)
+                    if next_value is None:
+                        continue  # No route onwards from action
+                    self.q_table[key] = self._seed_value(state, action, destination, next_value)
+                    seeded += 1
+        self.q_version += 1
+        if METRICS.enabled:
+            METRICS.count('seeded_entries', seeded)
+        return seeded
+
+    @instrumented
+    def seed_link(self, node1, node2):
+        """Re-seed both directions of a new, changed or removed link.
+
+        For every trained destination, Q(node1, node2) and Q(node2, node1)
+        are set from the far end's value in the table, falling back to its
+        Dijkstra route; a removed link's entries are dropped. Returns the
+        number of entries set.
+        """
+        seeded = 0
+        routes = {}  # destination -> dijkstra_values(), computed on demand
+        for destination in self._trained_destinations():
+            for state, action in ((node1, node2), (node2, node1)):
+                key = (state, action, destination)
+                if self.network.get_base_cost(state, action) == float('inf'):
+                    self.q_table.pop(key, None)
+                    continue
+                if state == destination:
+                    continue
+                next_value = self._table_value(action, destination)
+                if next_value is None:
+                    if destination not in routes:
+                        routes[destination] = self.dijkstra_values(destination)
+                    next_value = routes[destination].get(action)
+                if next_value is None:
+                    continue
+                self.q_table[key] = self._seed_value(state, action, destination, next_value)
+                seeded += 1
+        self.q_version += 1
+        if METRICS.enabled:
+            METRICS.count('seeded_entries', seeded)
+        return seeded
+
+    @instrumented
+    def sweep_link(self, node1, node2):
+        """Prioritized sweeping from the link node1-node2.
+
+        Replays a model-based backup of both directions of the link, then of
+        every (predecessor, state) action whose target depends on a value
+        that moved by more than sweep_threshold, largest change first, for
+        at most sweep_budget backups. Returns the number of backups done.
+        """
+        destinations = self._trained_destinations()
+        queue = [(-float('inf'), node1, node2), (-float('inf'), node2, node1)]
+        updates = 0
+
+        while queue and updates < self.sweep_budget:
+            _, state, action = heapq.heappop(queue)
+            change = self._backup(state, action, destinations)
+            updates += 1
+
+            # Everything leading into state now sees a different max Q
+            if change > self.sweep_threshold:
+                for predecessor in self.network.get_neighbors(state):
+                    heapq.heappush(queue, (-change * self.discount_factor,
+                                           predecessor, state))
+
+        self.q_version += 1
+        if METRICS.enabled:
+            METRICS.count('sweep_backups', updates)
+        return updates
+
+    def _trained_destinations(self):
+        """Destinations that have any learned Q-values"""
+        return {destination for _, _, destination in self.q_table}
+
+    def _backup(self, state, action, destinations):
+        """Full Bellman backup of Q(state, action) for each destination.
+
+        Only entries that already exist are touched, so untrained
+        destinations stay untrained. Returns the largest absolute change.
+        """
+        change = 0
+        removed = self.network.get_base_cost(state, action) == float('inf')
+        for destination in destinations:
+            key = (state, action, destination)
+            if key not in self.q_table:
+                continue
+            if removed:
+                change = max(change, abs(self.q_table.pop(key)))
+                continue
+
+            reward = self.get_reward(state, action, destination)
+            if action == destination:
+                max_next_q = 0  # Terminal state
+            else:
+                max_next_q = max([self.q_table.get((action, neighbor, destination), 0)
+                                  for neighbor in self.network.get_neighbors(action)],
+                                 default=0)
+
+            new_q = reward + self.discount_factor * max_next_q
+            change = max(change, abs(new_q - self.q_table[key]))
+            self.q_table[key] = new_q
+
+        return change
+
+    # Attributes persisted by save()/load() next to the Q-values
+    SNAPSHOT_PARAMS = ('learning_rate', 'discount_factor', 'epsilon',
+                       'max_steps', 'training_episodes')
+
+    def save(self, path):
+        """Save the Q-table and learning parameters to directory path.
+
+        Entries are stored as (state, action, destination) ID triplets plus
+        float64 values, with node names kept alongside for remapping.
+        """
+        ids = self.network.node_ids
+        items = [(key, value) for key, value in self.q_table.items()
+                 if all(node in ids for node in key)]
+        keys = np.array([[ids[node] for node in key] for key, _ in items],
+                        dtype=np.int32).reshape(-1, 3)
+        _save_snapshot(self, path, q_keys=keys,
+                            q_values=np.array([value for _, value in items], dtype=np.float64))
+
+    @classmethod
+    def load(cls, network, path, mmap_mode='r'):
+        """Load a router saved with save() on top of network"""
+        router, arrays = _load_snapshot(cls, network, path, mmap_mode)
+        nodes = arrays['nodes'].tolist()
+        for (state, action, destination), value in zip(arrays['q_keys'].tolist(),
+                                                        arrays['q_values'].tolist()):
+            router.q_table[(nodes[state], nodes[action], nodes[destination])] = value
+        return router
+
+class ArrayQLearningRouter(QLearningRouter):
+    """Q-Learning router backed by a dense NumPy Q-table.
+
+    Q-values live in q_values[destination, node, neighbor_slot] (float64),
+    where slots follow NetworkTopology.get_link_arrays(). Padding slots hold
+    -inf so row-wise max/argmax ignore them.
+    """
+
+    def __init__(self, network, incremental=False, transfer=False):
+        super().__init__(network, incremental, transfer)
+        del self.q_table  # Replaced by q_values
+        self.last_batch = None  # Per-round telemetry of the latest train_batch
+        self.q_values = None  # Allocated on first use
+        self._trained = None  # Bool per destination ID: has any learned Q-values
+        self._layout = None  # Link arrays the Q array was sized for
+        self._dropped = {}  # (state ID, action ID) -> Q column of a removed link, until swept
+        self.rng = np.random.default_rng()  # Used by batched training
+        self._trace = None  # PathBuffer reused by episodes and path walks
+        self._visited = None  # Byte per node, reset after every walk
+
+    def _ensure_q_values(self):
+        """(Re)allocate the Q array when the topology structure changed.
+
+        Q-values of links present in both layouts are carried over; new
+        links start at zero (see seed_link() and warm_start()).
+        """
+        neighbors, _, degrees = self.network.get_link_arrays()
+        if self.q_values is None or self._layout is not neighbors:
+            num_nodes, width = neighbors.shape
+            q_values = np.zeros((num_nodes, num_nodes, width))
+            q_values[:, neighbors < 0] = -np.inf
+            trained = np.zeros(num_nodes, dtype=bool)
+            if self.q_values is not None:
+                self._remap_q_values(q_values, neighbors)
+                trained[:len(self._trained)] = self._trained
+            self.q_values = q_values
+            self._trained = trained
+            self._layout = neighbors
+            self.q_version += 1
+        return neighbors, degrees
+
+    def _remap_q_values(self, q_values, neighbors):
+        """Copy the current Q array into q_values, a new layout's array.
+
+        With incremental sweeping, the Q-values of removed links are kept in
+        _dropped so _backup() can report how much they changed.
+        """
+        node, new_slot, old_slot = _matching_slots(self._layout, neighbors)
+        q_values[:self._layout.shape[0], node, new_slot] = self.q_values[:, node, old_slot]
+        if self.incremental:
+            removed = self._layout >= 0
+            removed[node, old_slot] = False
+            self._dropped = {(row, int(self._layout[row, slot])): self.q_values[:, row, slot]
+                             for row, slot in zip(*np.nonzero(removed))}
+
+    def _walk_buffers(self, num_nodes):
+        """Reusable (trace, visited) buffers sized for max_steps and num_nodes"""
+        if self._trace is None or self._trace.capacity < self.max_steps + 1 \
+                or self._trace.names is not self.network.nodes:
+            self._trace = PathBuffer(self.max_steps + 1, self.network.nodes)
+        if self._visited is None or len(self._visited) != num_nodes:
+            self._visited = bytearray(num_nodes)
+        return self._trace, self._visited
+
+    def _slot(self, state, action):
+        """Neighbor slot of action in state's row"""
+        return self.network.get_neighbors(state).index(action)
+
+    def get_q_value(self, state, action, destination):
+        """Look up Q(state, action) for a destination by node name"""
+        self._ensure_q_values()
+        ids = self.network.node_ids
+        return float(self.q_values[ids[destination], ids[state],
+                                   self._slot(state, action)])
+
+    def _choose_slot(self, state_id, destination_id, degree, training):
+        """Epsilon-greedy choice of a neighbor slot"""
+        if training and random.random() < self.epsilon:
+            return random.randrange(degree)  # Explore
+        return int(np.argmax(self.q_values[destination_id, state_id, :degree]))
 
-def create_network_visualization(network, path=None, title="Network Topology"):
-    """Create network visualization using NetworkX and Matplotlib"""
+    def _update_slot(self, state_id, slot, reward, next_id, destination_id, degrees):
+        """Bellman update of one (destination, state, slot) entry"""
+        if next_id == destination_id or degrees[next_id] == 0:
+            max_next_q = 0  # Terminal state
+        else:
+            max_next_q = self.q_values[destination_id, next_id].max()
 
-    # Create NetworkX graph
-    G = nx.Graph()
+        current_q = self.q_values[destination_id, state_id, slot]
+        delta = self.learning_rate * (reward + self.discount_factor * max_next_q - current_q)
+        self.q_values[destination_id, state_id, slot] = current_q + delta
+        self._trained[destination_id] = True
+        self.q_version += 1
+        return delta
 
-    # Add nodes
-    for node in network.nodes:
-        G.add_node(node)
+    def choose_action(self, state, destination, training=True):
+        """Choose next node using epsilon-greedy policy"""
+        neighbors, degrees = self._ensure_q_values()
+        ids = self.network.node_ids
+        state_id = ids[state]
+        if degrees[state_id] == 0:
+            return None
+        slot = self._choose_slot(state_id, ids[destination], degrees[state_id], training)
+        return self.network.nodes[neighbors[state_id, slot]]
 
-    # Add edges
-    for u, v, weight in network.edges:
-        G.add_edge(u, v, weight=weight)
+    def update_q_value(self, state, action, reward, next_state, destination):
+        """Update Q-value using Q-learning formula"""
+        _, degrees = self._ensure_q_values()
+        ids = self.network.node_ids
+        return self._update_slot(ids[state], self._slot(state, action), reward,
+                                 ids[next_state], ids[destination], degrees)
 
-    # Set up the plot
-    plt.figure(figsize=(10, 6))
+    def train_episode(self, source, destination):
+        """Train one episode"""
+        ids = self.network.node_ids
+        return self.train_episode_ids(ids[source], ids[destination]).to_list()
+
+    @instrumented
+    def train_episode_ids(self, current, destination_id):
+        """Train one episode between node IDs.
+
+        Returns the episode trace in the router's reused PathBuffer.
+        """
+        neighbors, degrees = self._ensure_q_values()
+        costs = self.network.get_actual_cost_array()
+        trace, visited = self._walk_buffers(len(degrees))
+        path = trace.ids
+        path[0] = current
+        length = 1
+        total_reward = 0
+        max_delta = 0
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.attach(self.network)
+
+        for step in range(self.max_steps):
+            if current == destination_id or visited[current]:
+                break
+            visited[current] = 1
 
-    # Node positions (fixed layout for consistency)
-    pos = {
-        'A': (0, 1), 'B': (2, 1), 'C': (0, 0), 
-        'D': (2, 0), 'E': (1, 0.5), 'F': (3, 0.5)
-    }
+            if degrees[current] == 0:
+                break
+            slot = self._choose_slot(current, destination_id, degrees[current], True)
+            next_node = int(neighbors[current, slot])
+
+            # Negative cost as reward, bonus for reaching destination
+            reward = -costs[current, slot]
+            if next_node == destination_id:
+                reward += 100
+            total_reward += reward
+            if recorder is not None:
+                recorder.record(current, next_node, reward, next_node, destination_id)
+
+            delta = self._update_slot(current, slot, reward, next_node, destination_id, degrees)
+            max_delta = max(max_delta, abs(delta))
+
+            path[length] = next_node
+            length += 1
+            current = next_node
 
-    # Draw all edges (normal)
-    nx.draw_networkx_edges(G, pos, alpha=0.3, width=2, edge_color='gray')
+        # Clear only the visited bytes this episode set
+        for node in path[:length]:
+            visited[node] = 0
+        trace.length = length
 
-    # Draw congested edges in red
-    congested_edges = []
-    for u, v, _ in network.edges:
-        if (u, v) in network.congestion or (v, u) in network.congestion:
-            congested_edges.append((u, v))
-
-    if congested_edges:
-        nx.draw_networkx_edges(G, pos, edgelist=congested_edges, 
-                             edge_color='red', width=4, alpha=0.8)
-
-    # Draw current path in blue
-    if path and len(path) > 1:
-        path_edges = [(path[i], path[i+1]) for i in range(len(path)-1)]
-        nx.draw_networkx_edges(G, pos, edgelist=path_edges, 
-                             edge_color='blue', width=5, alpha=0.9)
-
-    # Draw nodes
-    nx.draw_networkx_nodes(G, pos, node_color='lightblue', 
-                          node_size=1000, alpha=0.9)
-
-    # Draw node labels
-    nx.draw_networkx_labels(G, pos, font_size=14, font_weight='bold')
-
-    # Draw edge labels (costs)
-    edge_labels = {}
-    for u, v, weight in network.edges:
-        if (u, v) in network.congestion or (v, u) in network.congestion:
-            edge_labels[(u, v)] = f"{weight}×3"  # Show congestion multiplier
+        self.training_episodes += 1
+        self.last_episode = {'reward': float(total_reward), 'max_delta_q': float(max_delta)}
+        if METRICS.enabled:
+            _count_walk(length - 1, current == destination_id, training=True)
+        return trace
+
+    @instrumented
+    def train_batch(self, pairs, episodes=1):
+        """Train many (source, destination) episodes in lockstep.
+
+        Each round runs one episode per pair, with all pairs advancing one
+        hop per step as NumPy vectors. Lanes that hit the same Q entry in
+        the same step are resolved last-write-wins. Returns the fraction of
+        lanes that reached their destination in each round.
+
+        Every hop costs a fixed few dozen NumPy calls, whatever the batch
+        size, so this beats looping train_episode() only from about a
+        hundred pairs per call (10x at a thousand); with a few dozen pairs,
+        as on the demo network, train_episode() is faster. benchmark.py's
+        train_batch_sizes case measures the crossover.
+        """
+        neighbors, degrees = self._ensure_q_values()
+        costs = self.network.get_actual_cost_array()
+        ids = self.network.node_ids
+        sources = np.array([ids[s] for s, _ in pairs], dtype=np.int32)
+        destinations = np.array([ids[d] for _, d in pairs], dtype=np.int32)
+        if self.recorder is not None:
+            self.recorder.attach(self.network)
+
+        success, max_delta, total_reward = train_lockstep(
+            self.q_values, neighbors, degrees, costs, sources, destinations,
+            episodes, self._hyperparameters(), self.rng, self.recorder)
+        self.training_episodes += len(pairs) * episodes
+        self._trained[destinations] = True
+        self.q_version += 1
+        self._record_batch(max_delta, total_reward, len(pairs))
+        return success
+
+    @instrumented
+    def train_parallel(self, pairs, episodes=1, processes=None):
+        """Train pairs on a process pool, sharded by destination.
+
+        Q-values for different destinations never interact, so each worker
+        trains its own destinations with train_batch's lockstep loop (not
+        recorded by self.recorder, which lives in this process). The
+        topology arrays and the Q array live in shared memory: workers read
+        the former and write only their own destination rows of the latter,
+        so merging is just copying the shared Q array back.
+        """
+        neighbors, degrees = self._ensure_q_values()
+        costs = self.network.get_actual_cost_array()
+        ids = self.network.node_ids
+        processes = processes or os.cpu_count() or 1
+
+        # Round-robin destinations over shards
+        by_destination = defaultdict(list)
+        for source, destination in pairs:
+            by_destination[ids[destination]].append(ids[source])
+        shards = [[] for _ in range(processes)]
+        for i, (destination, sources) in enumerate(sorted(by_destination.items())):
+            shards[i % processes].extend((source, destination) for source in sources)
+        shards = [shard for shard in shards if shard]
+
+        shared = [_share_array(values) for values in
+                  (self.q_values, neighbors, degrees, costs)]
+        seeds = self.rng.integers(2**32, size=len(shards))
+        jobs = [([spec for _, spec in shared], shard, episodes,
+                 self._hyperparameters(), int(seed))
+                for shard, seed in zip(shards, seeds)]
+        try:
+            with multiprocessing.Pool(min(processes, max(len(jobs), 1))) as pool:
+                results = pool.map(_train_shard, jobs)
+            q_shm, q_spec = shared[0]
+            self.q_values[...] = _attach_array(q_spec, q_shm)
+            self._trained[list(by_destination)] = True
+            self.q_version += 1
+        finally:
+            for shm, _ in shared:
+                shm.close()
+                shm.unlink()
+
+        self.training_episodes += len(pairs) * episodes
+        if not results:
+            return np.zeros(episodes)
+        self._record_batch(np.max([max_delta for _, max_delta, _ in results], axis=0),
+                           sum(total_reward for _, _, total_reward in results), len(pairs))
+        return sum(success * len(shard) for (success, _, _), shard
+                   in zip(results, shards)) / len(pairs)
+
+    def _record_batch(self, max_delta, total_reward, num_pairs):
+        """Keep per-round telemetry of the latest batched training call"""
+        self.last_batch = {
+            'max_delta_q': max_delta,
+            'mean_reward': total_reward / max(num_pairs, 1),
+        }
+        if METRICS.enabled:
+            METRICS.count('episodes', num_pairs * len(max_delta))
+            METRICS.count('batch_rounds', len(max_delta))
+        log.debug("batch of %d pairs x %d rounds, final max |dQ| %s",
+                  num_pairs, len(max_delta), max_delta[-1] if len(max_delta) else None)
+
+    def _trained_destinations(self):
+        """Destinations that have any learned Q-values"""
+        self._ensure_q_values()
+        return np.flatnonzero(self._trained)
+
+    @instrumented
+    def train_offline(self, transitions, passes=1, chunk_size=1 << 20, batch_size=4096):
+        """Learn from a TransitionLog with vectorized batch updates.
+
+        The log is read in memory-mapped chunks of chunk_size records and
+        applied batch_size records at a time. Targets use the Q array as it
+        was at the start of each batch; n records hitting the same entry
+        move it towards their mean target as far as n sequential updates
+        would. Transitions over links or nodes the network no longer has
+        are skipped.
+        """
+        neighbors, degrees = self._ensure_q_values()
+        ids = self.network.node_ids
+        applied = skipped = 0
+        max_delta = 0
+        for _ in range(passes):
+            for chunk in transitions.read_chunks(chunk_size):
+                # Log IDs -> network IDs, -1 for nodes the network lacks
+                translate = np.array([ids.get(node, -1) for node in transitions.nodes] + [-1])
+                for start in range(0, len(chunk), batch_size):
+                    batch = chunk[start:start + batch_size]
+                    count, delta = self._apply_transitions(
+                        translate[batch['state']], translate[batch['action']],
+                        batch['reward'], translate[batch['next_state']],
+                        translate[batch['destination']], neighbors, degrees)
+                    applied += count
+                    skipped += len(batch) - count
+                    max_delta = max(max_delta, delta)
+        return _offline_result(applied, skipped, max_delta)
+
+    def _apply_transitions(self, state, action, reward, next_state, destination,
+                           neighbors, degrees):
+        """One batched Q update from transition arrays; returns (applied, max |ΔQ|)"""
+        match = neighbors[state] == action[:, None]
+        valid = ((state >= 0) & (action >= 0) & (next_state >= 0) & (destination >= 0)
+                 & match.any(axis=1))
+        if not valid.all():
+            state, reward, next_state, destination = (
+                state[valid], reward[valid], next_state[valid], destination[valid])
+            match = match[valid]
+        if len(state) == 0:
+            return 0, 0
+
+        terminal = (next_state == destination) | (degrees[next_state] == 0)
+        max_next_q = np.where(terminal, 0, self.q_values[destination, next_state].max(axis=1))
+        target = reward + self.discount_factor * max_next_q
+
+        # Merge records that share a (destination, state, slot) entry
+        index = np.ravel_multi_index((destination, state, match.argmax(axis=1)),
+                                     self.q_values.shape)
+        entries, inverse, counts = np.unique(index, return_inverse=True, return_counts=True)
+        mean_target = np.bincount(inverse, weights=target) / counts
+        entries = np.unravel_index(entries, self.q_values.shape)
+        delta = (1 - (1 - self.learning_rate) ** counts) * (mean_target - self.q_values[entries])
+        self.q_values[entries] += delta
+        self._trained[destination] = True
+        self.q_version += 1
+        return len(state), float(np.abs(delta).max())
+
+    def _table_value_array(self, destination_ids, node_id):
+        """Best learned Q(node, ·) per destination (NaN where none is learned)"""
+        q_node = self.q_values[destination_ids, node_id]
+        learned = (np.isfinite(q_node) & (q_node != 0)).any(axis=1)
+        return np.where(learned, q_node.max(axis=1), np.nan)
+
+    @instrumented
+    def warm_start(self, destinations=None, from_table=True, overwrite=False):
+        """Seed Q-values from Dijkstra routes instead of zeros.
+
+        Same semantics as QLearningRouter.warm_start(), one whole
+        destination layer at a time. Untrained entries are the zero ones.
+        """
+        neighbors, degrees = self._ensure_q_values()
+        ids = self.network.node_ids
+        destination_ids = (range(len(self.network.nodes)) if destinations is None
+                           else [ids[node] for node in destinations])
+        costs = self.network.get_actual_cost_array()
+        valid = neighbors >= 0
+        seeded = 0
+
+        for destination_id in destination_ids:
+            values = _dijkstra_value_array(self.network, destination_id, self.discount_factor)
+            if from_table:
+                q_layer = self.q_values[destination_id]
+                learned = (np.isfinite(q_layer) & (q_layer != 0)).any(axis=1)
+                values = np.where(learned, q_layer.max(axis=1), values)
+            values[destination_id] = 0  # Terminal state
+
+            arrived = neighbors == destination_id
+            next_value = values[np.where(valid, neighbors, 0)]
+            seed = (-costs + np.where(arrived, 100, 0)
+                    + self.discount_factor * np.where(arrived, 0, next_value))
+            target = valid & ~np.isnan(seed)
+            target[destination_id] = False  # No actions out of the destination
+            if not overwrite:
+                target &= self.q_values[destination_id] == 0
+            self.q_values[destination_id][target] = seed[target]
+            self._trained[destination_id] |= bool(target.any())
+            seeded += int(target.sum())
+
+        self.q_version += 1
+        if METRICS.enabled:
+            METRICS.count('seeded_entries', seeded)
+        return seeded
+
+    @instrumented
+    def seed_link(self, node1, node2):
+        """Re-seed both directions of a new or changed link for all trained destinations"""
+        neighbors, _ = self._ensure_q_values()
+        ids = self.network.node_ids
+        destinations = self._trained_destinations()
+        seeded = 0
+
+        for state, action in ((node1, node2), (node2, node1)):
+            state_id, action_id = ids[state], ids[action]
+            slots = np.flatnonzero(neighbors[state_id] == action_id)
+            if len(slots) == 0:
+                continue  # Removed link; the new layout has no slot for it
+            targets = destinations[destinations != state_id]
+            next_value = self._table_value_array(targets, action_id)
+            for i in np.flatnonzero(np.isnan(next_value) & (targets != action_id)):
+                next_value[i] = _dijkstra_value_array(self.network, targets[i],
+                                                      self.discount_factor)[action_id]
+
+            arrived = targets == action_id
+            seed = (-self.network.get_actual_cost(state, action) + np.where(arrived, 100, 0)
+                    + self.discount_factor * np.where(arrived, 0, next_value))
+            keep = ~np.isnan(seed)
+            self.q_values[targets[keep], state_id, slots[0]] = seed[keep]
+            seeded += int(keep.sum())
+
+        self.q_version += 1
+        if METRICS.enabled:
+            METRICS.count('seeded_entries', seeded)
+        return seeded
+
+    def _backup(self, state, action, destinations):
+        """Full Bellman backup of Q(state, action) for all destinations at once"""
+        neighbors, degrees = self._ensure_q_values()
+        ids = self.network.node_ids
+        state_id, action_id = ids[state], ids[action]
+        slots = np.flatnonzero(neighbors[state_id] == action_id)
+        if len(slots) == 0:
+            # Link is gone: its learned entries changed by their whole value
+            dropped = self._dropped.pop((state_id, action_id), None)
+            if dropped is None:
+                return 0
+            dropped = dropped[destinations[destinations < len(dropped)]]
+            return float(np.abs(dropped[dropped != 0]).max(initial=0))
+        slot = slots[0]
+
+        # Only touch destinations already learned at this state
+        q_state = self.q_values[destinations, state_id, :degrees[state_id]]
+        destinations = destinations[(q_state != 0).any(axis=1)]
+        if len(destinations) == 0:
+            return 0
+
+        arrived = destinations == action_id
+        max_next_q = np.where(
+            arrived, 0, self.q_values[destinations, action_id].max(axis=1))
+        reward = -self.network.get_actual_cost(state, action) + np.where(arrived, 100, 0)
+
+        new_q = reward + self.discount_factor * max_next_q
+        change = np.abs(new_q - self.q_values[destinations, state_id, slot]).max()
+        self.q_values[destinations, state_id, slot] = new_q
+        return float(change)
+
+    def save(self, path):
+        """Save the dense Q array and learning parameters to directory path"""
+        neighbors, _ = self._ensure_q_values()
+        _save_snapshot(self, path, q_values=self.q_values, neighbors=neighbors)
+
+    @classmethod
+    def load(cls, network, path, mmap_mode='r'):
+        """Load a router saved with save(), memory-mapping the Q array.
+
+        With the default mmap_mode='r' the policy is read-only (inference
+        only) and every process loading the same file shares its pages; use
+        'c' for copy-on-write to keep training, or None to read it into RAM.
+        The network must have the same nodes and links as when saved.
+        """
+        router, arrays = _load_snapshot(cls, network, path, mmap_mode)
+        neighbors, _, _ = network.get_link_arrays()
+        if (arrays['nodes'].tolist() != network.nodes
+                or not np.array_equal(arrays['neighbors'], neighbors)):
+            raise ValueError(f"Q snapshot {path} was saved for a different topology")
+        router.q_values = arrays['q_values']
+        learned = np.isfinite(router.q_values) & (router.q_values != 0)
+        router._trained = learned.any(axis=(1, 2))
+        router._layout = neighbors
+        return router
+
+    def _hyperparameters(self):
+        """Learning parameters shared by the vectorized training loops"""
+        return self.learning_rate, self.discount_factor, self.epsilon, self.max_steps
+
+    def find_best_path(self, source, destination):
+        """Find best path using learned Q-values (no exploration)"""
+        ids = self.network.node_ids
+        path = self.find_best_path_ids(ids[source], ids[destination])
+        path = path.to_list() if path is not None else None
+        log.debug("q-route %s -> %s: %s", source, destination, path)
+        return path
+
+    @instrumented
+    def find_best_path_ids(self, current, destination_id, out=None):
+        """Greedy path between node IDs written into a PathBuffer.
+
+        Uses out if given (it must hold max_steps + 1 IDs), otherwise the
+        router's reused buffer. Returns the buffer, or None if no path.
+        """
+        neighbors, degrees = self._ensure_q_values()
+        trace, visited = self._walk_buffers(len(degrees))
+        trace = out if out is not None else trace
+        path = trace.ids
+        path[0] = current
+        length = 1
+
+        for step in range(self.max_steps):
+            if current == destination_id or visited[current]:
+                break
+            visited[current] = 1
+
+            if degrees[current] == 0:
+                break
+            slot = self._choose_slot(current, destination_id, degrees[current], False)
+            current = int(neighbors[current, slot])
+            path[length] = current
+            length += 1
+
+        for node in path[:length]:
+            visited[node] = 0
+        trace.length = length
+
+        if METRICS.enabled:
+            _count_walk(length - 1, current == destination_id, training=False)
+        return trace if current == destination_id else None
+
+class ApproxQLearningRouter:
+    """Q-learning router with a function approximator instead of a Q-table.
+
+    Q(state, action, destination) is predicted by a small NumPy MLP (a
+    linear model with hidden=()) from landmark-distance embeddings of the
+    action and destination nodes plus the current cost and congestion of
+    the link. Each step replays a minibatch of stored transitions against
+    a periodically synced target network. Memory is O(nodes x landmarks +
+    replay_size) however many destinations are trained, and what is learned
+    for one destination carries over to nearby ones.
+
+    Shares the train_episode/find_best_path interface of the tabular
+    routers. There is no table to sweep or re-seed on link changes: the
+    link features already reflect them.
+    """
+
+    VALUE_SCALE = 100.0  # Network outputs are Q-values in units of the arrival bonus
+
+    SNAPSHOT_PARAMS = QLearningRouter.SNAPSHOT_PARAMS + (
+        'landmarks', 'hidden', 'replay_size', 'batch_size', 'target_sync')
+
+    def __init__(self, network, landmarks=8, hidden=(32,), replay_size=50000,
+                 batch_size=64, seed=None):
+        self.network = network
+        self.learning_rate = 0.001  # Adam step size
+        self.discount_factor = 0.9
+        self.epsilon = 0.1  # Exploration rate
+        self.max_steps = 10  # Hop limit per episode / path walk
+        self.training_episodes = 0
+        self.q_version = 0  # Bumped by every weight update; caches compare against it
+        self.last_episode = None  # Reward and max |TD error| of the latest episode
+
+        self.landmarks = landmarks
+        self.hidden = tuple(hidden)
+        self.replay_size = replay_size
+        self.batch_size = batch_size
+        self.target_sync = 500  # Minibatch updates between target network syncs
+        self.rng = np.random.default_rng(seed)
+
+        self.layers = None  # [[W, b], ...], built on first use
+        self._target = None  # Frozen copy of layers used for TD targets
+        self._adam = None
+        self._updates = 0
+        self._embedding = None  # [node, landmark] scaled distances
+        self._layout = None  # Link arrays the embedding and replay were built for
+        self._replay = None  # (states, slots, destinations, rewards) ring buffer
+        self._replay_next = 0
+        self._replay_len = 0
+
+    def _ensure_model(self):
+        """(Re)build embeddings, replay buffer and network as needed"""
+        neighbors, base_costs, degrees = self.network.get_link_arrays()
+        if self._layout is not neighbors:
+            self._embed(base_costs)
+            # Stored slots refer to the old link arrays
+            self._replay = (np.zeros(self.replay_size, dtype=np.int32),
+                            np.zeros(self.replay_size, dtype=np.int32),
+                            np.zeros(self.replay_size, dtype=np.int32),
+                            np.zeros(self.replay_size))
+            self._replay_next = self._replay_len = 0
+            self._layout = neighbors
+        if self.layers is None:
+            sizes = (self._embedding.shape[1] + 4,) + self.hidden + (1,)
+            self.layers = [[self.rng.normal(0, np.sqrt(2 / n_in), (n_in, n_out)), np.zeros(n_out)]
+                           for n_in, n_out in zip(sizes[:-1], sizes[1:])]
+            self._target = [[W.copy(), b.copy()] for W, b in self.layers]
+            self._adam = [[np.zeros_like(p) for p in layer for _ in range(2)]
+                          for layer in self.layers]
+        return neighbors, degrees
+
+    def _embed(self, base_costs):
+        """Base-cost distances to landmarks picked by farthest-point sampling"""
+        count = max(1, min(self.landmarks, len(self.network.nodes)))
+        distances = PathEngine(self.network).prepare_landmarks(count).T  # [node, landmark]
+        finite = np.isfinite(distances)
+        scale = max(float(distances[finite].max()), 1.0) if finite.any() else 1.0
+        distances[~finite] = 2 * scale
+        self._embedding = distances / scale
+        finite_costs = base_costs[np.isfinite(base_costs)]
+        self._cost_scale = float(finite_costs.mean()) if len(finite_costs) else 1.0
+
+    def _features(self, states, slots, destinations):
+        """Feature rows for (state, neighbor slot, destination) triples"""
+        neighbors, base_costs, _ = self.network.get_link_arrays()
+        actions = neighbors[states, slots]
+        cost = self.network.get_actual_cost_array()[states, slots]
+        gap = np.abs(self._embedding[actions] - self._embedding[destinations])
+        return np.column_stack([
+            gap,
+            gap.max(axis=1),  # Landmark lower bound on the remaining distance
+            cost / self._cost_scale,
+            cost > base_costs[states, slots],  # Congested
+            actions == destinations,
+        ])
+
+    @staticmethod
+    def _forward(layers, X):
+        """Network output (scaled Q) plus the activations of every layer"""
+        activations = [X]
+        for i, (W, b) in enumerate(layers):
+            X = X @ W + b
+            if i < len(layers) - 1:
+                X = np.maximum(X, 0)
+            activations.append(X)
+        return X[:, 0], activations
+
+    def _q_rows(self, states, destinations, layers=None):
+        """Scaled Q-values of every neighbor slot, -inf for padding: [len(states), width]"""
+        neighbors, degrees = self._ensure_model()
+        width = neighbors.shape[1]
+        states = np.repeat(states, width)
+        destinations = np.repeat(destinations, width)
+        slots = np.tile(np.arange(width), len(states) // width)
+        valid = slots < degrees[states]
+        q = np.full(len(states), -np.inf)
+        if valid.any():
+            q[valid], _ = self._forward(layers or self.layers,
+                                        self._features(states[valid], slots[valid],
+                                                       destinations[valid]))
+        return q.reshape(-1, width)
+
+    def get_q_value(self, state, action, destination):
+        """Predicted Q(state, action) for a destination by node name"""
+        self._ensure_model()
+        ids = self.network.node_ids
+        slot = self.network.get_neighbors(state).index(action)
+        q = self._q_rows(np.array([ids[state]]), np.array([ids[destination]]))
+        return float(q[0, slot] * self.VALUE_SCALE)
+
+    def choose_action(self, state, destination, training=True):
+        """Choose next node using epsilon-greedy policy"""
+        neighbors, degrees = self._ensure_model()
+        ids = self.network.node_ids
+        state_id = ids[state]
+        if degrees[state_id] == 0:
+            return None
+        if training and random.random() < self.epsilon:
+            slot = random.randrange(degrees[state_id])  # Explore
         else:
-            edge_labels[(u, v)] = str(weight)
+            slot = int(np.argmax(self._q_rows(np.array([state_id]),
+                                              np.array([ids[destination]]))[0]))
+        return self.network.nodes[neighbors[state_id, slot]]
 
-    nx.draw_networkx_edge_labels(G, pos, edge_labels, font_size=10)
+    @instrumented
+    def train_episode(self, source, destination):
+        """Train one episode, replaying a minibatch after every step"""
+        neighbors, degrees = self._ensure_model()
+        costs = self.network.get_actual_cost_array()
+        ids = self.network.node_ids
+        destination_id = ids[destination]
+        current = ids[source]
+        path = [current]
+        visited = set()
+        total_reward = 0
+        max_td = 0
+
+        for step in range(self.max_steps):
+            if current == destination_id or current in visited or degrees[current] == 0:
+                break
+            visited.add(current)
+
+            if random.random() < self.epsilon:
+                slot = random.randrange(degrees[current])  # Explore
+            else:
+                slot = int(np.argmax(self._q_rows(np.array([current]),
+                                                  np.array([destination_id]))[0]))
+            next_node = int(neighbors[current, slot])
+
+            # Negative cost as reward, bonus for reaching destination
+            reward = -costs[current, slot]
+            if next_node == destination_id:
+                reward += 100
+            total_reward += reward
+
+            self._remember(current, slot, destination_id, reward)
+            max_td = max(max_td, self._replay_step())
+
+            path.append(next_node)
+            current = next_node
+
+        self.training_episodes += 1
+        self.last_episode = {'reward': float(total_reward), 'max_delta_q': float(max_td)}
+        if METRICS.enabled:
+            _count_walk(len(path) - 1, current == destination_id, training=True)
+        return [self.network.nodes[i] for i in path]
+
+    def find_path(self, source, destination):
+        """Common routing entry point shared by all routers"""
+        return self.find_best_path(source, destination)
+
+    @instrumented
+    def find_best_path(self, source, destination):
+        """Find best path using the approximator's greedy policy (no exploration)"""
+        neighbors, degrees = self._ensure_model()
+        ids = self.network.node_ids
+        destination_id = ids[destination]
+        current = ids[source]
+        path = [current]
+        visited = set()
 
-    plt.title(title, fontsize=16, fontweight='bold')
-    plt.axis('off')
-    plt.tight_layout()
+        for step in range(self.max_steps):
+            if current == destination_id or current in visited or degrees[current] == 0:
+                break
+            visited.add(current)
+            slot = int(np.argmax(self._q_rows(np.array([current]),
+                                              np.array([destination_id]))[0]))
+            current = int(neighbors[current, slot])
+            path.append(current)
 
+        if METRICS.enabled:
+            _count_walk(len(path) - 1, current == destination_id, training=False)
+        if current != destination_id:
+            return None
+        return [self.network.nodes[i] for i in path]
+
+    def _remember(self, state, slot, destination, reward):
+        """Append one transition to the replay ring buffer"""
+        for column, value in zip(self._replay, (state, slot, destination, reward)):
+            column[self._replay_next] = value
+        self._replay_next = (self._replay_next + 1) % self.replay_size
+        self._replay_len = min(self._replay_len + 1, self.replay_size)
+
+    def _remember_many(self, states, slots, destinations, rewards):
+        """Append equal-length transition arrays to the replay ring buffer"""
+        index = (self._replay_next + np.arange(len(states))) % self.replay_size
+        for column, values in zip(self._replay, (states, slots, destinations, rewards)):
+            column[index] = values
+        self._replay_next = int(index[-1] + 1) % self.replay_size
+        self._replay_len = min(self._replay_len + len(states), self.replay_size)
+
+    def _replay_step(self):
+        """One Adam step on a replayed minibatch; returns max |TD error| in Q units"""
+        neighbors, degrees = self._ensure_model()
+        batch = self.rng.integers(self._replay_len, size=min(self.batch_size, self._replay_len))
+        states, slots, destinations, rewards = (column[batch] for column in self._replay)
+        actions = neighbors[states, slots]
+
+        # TD target from the frozen network: r + γ max Q(next, ·), 0 past the end
+        terminal = (actions == destinations) | (degrees[actions] == 0)
+        next_q = np.zeros(len(batch))
+        if not terminal.all():
+            next_q[~terminal] = self._q_rows(actions[~terminal], destinations[~terminal],
+                                             self._target).max(axis=1)
+        target = rewards / self.VALUE_SCALE + self.discount_factor * next_q
+
+        prediction, activations = self._forward(self.layers,
+                                                self._features(states, slots, destinations))
+        error = prediction - target
+        self._adam_step(activations, np.clip(error, -1, 1) / len(batch))  # Huber loss
+
+        self._updates += 1
+        self.q_version += 1
+        if self._updates % self.target_sync == 0:
+            self._target = [[W.copy(), b.copy()] for W, b in self.layers]
+        return float(np.abs(error).max()) * self.VALUE_SCALE
+
+    def _adam_step(self, activations, gradient, beta1=0.9, beta2=0.999):
+        """Backpropagate d(loss)/d(output) and apply one Adam update"""
+        step = self._updates + 1
+        gradient = gradient[:, None]
+        for i in reversed(range(len(self.layers))):
+            W, b = self.layers[i]
+            grads = (activations[i].T @ gradient, gradient.sum(axis=0))
+            if i > 0:
+                gradient = (gradient @ W.T) * (activations[i] > 0)
+            for param, grad, m, v in zip(self.layers[i], grads,
+                                         self._adam[i][0::2], self._adam[i][1::2]):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad ** 2
+                m_hat = m / (1 - beta1 ** step)
+                v_hat = v / (1 - beta2 ** step)
+                param -= self.learning_rate * m_hat / (np.sqrt(v_hat) + 1e-8)
+
+    def greedy_next_hops(self):
+        """Greedy next hop for every (node, destination) pair, -1 if none"""
+        neighbors, degrees = self._ensure_model()
+        num_nodes = len(self.network.nodes)
+        nodes = np.arange(num_nodes)
+        next_hop = np.full((num_nodes, num_nodes), -1, dtype=np.int32)
+        for destination in range(num_nodes):
+            slots = np.argmax(self._q_rows(nodes, np.full(num_nodes, destination)), axis=1)
+            next_hop[:, destination] = neighbors[nodes, slots]
+        next_hop[degrees == 0] = -1
+        return next_hop
+
+    @instrumented
+    def warm_start(self, destinations=None, steps=2000):
+        """Fit the approximator to Dijkstra routes instead of random weights.
+
+        Q(state, action, destination) is regressed onto the return of taking
+        the action and then following TraditionalRouter's route, for every
+        link and each destination (all nodes by default), with `steps`
+        minibatch Adam steps. Returns the number of regression targets.
+        """
+        neighbors, degrees = self._ensure_model()
+        costs = self.network.get_actual_cost_array()
+        ids = self.network.node_ids
+        destination_ids = (range(len(self.network.nodes)) if destinations is None
+                           else [ids[node] for node in destinations])
+        states, slots = np.nonzero(neighbors >= 0)
+        actions = neighbors[states, slots]
+
+        columns = [], [], [], []
+        for destination_id in destination_ids:
+            values = _dijkstra_value_array(self.network, destination_id, self.discount_factor)
+            arrived = actions == destination_id
+            target = (-costs[states, slots] + np.where(arrived, 100, 0)
+                      + self.discount_factor * np.where(arrived, 0, values[actions]))
+            keep = (states != destination_id) & ~np.isnan(target)
+            for column, value in zip(columns, (states[keep], slots[keep],
+                                               np.full(keep.sum(), destination_id),
+                                               target[keep] / self.VALUE_SCALE)):
+                column.append(value)
+        if not any(len(column) for column in columns[0]):
+            return 0
+        states, slots, destinations, targets = (np.concatenate(column) for column in columns)
+
+        for _ in range(steps):
+            batch = self.rng.integers(len(states), size=min(self.batch_size, len(states)))
+            prediction, activations = self._forward(
+                self.layers, self._features(states[batch], slots[batch], destinations[batch]))
+            error = prediction - targets[batch]
+            self._adam_step(activations, np.clip(error, -1, 1) / len(batch))  # Huber loss
+        self._target = [[W.copy(), b.copy()] for W, b in self.layers]
+        self.q_version += 1
+        if METRICS.enabled:
+            METRICS.count('seeded_entries', len(states))
+        return len(states)
+
+    @instrumented
+    def train_offline(self, transitions, passes=1, chunk_size=1 << 20, replay_ratio=1.0):
+        """Learn from a TransitionLog through the replay buffer.
+
+        Logged transitions enter the replay buffer batch_size at a time, in
+        log order, each batch followed by replay_ratio minibatch updates per
+        transition (train_episode does one per step). Transitions over links
+        or nodes the network no longer has are skipped. Returns counts of
+        applied and skipped transitions plus the largest |TD error|.
+        """
+        neighbors, degrees = self._ensure_model()
+        ids = self.network.node_ids
+        applied = skipped = 0
+        max_td = 0
+        for _ in range(passes):
+            for chunk in transitions.read_chunks(chunk_size):
+                # Log IDs -> network IDs, -1 for nodes the network lacks
+                translate = np.array([ids.get(node, -1) for node in transitions.nodes] + [-1])
+                for start in range(0, len(chunk), self.batch_size):
+                    batch = chunk[start:start + self.batch_size]
+                    state = translate[batch['state']]
+                    destination = translate[batch['destination']]
+                    match = neighbors[state] == translate[batch['action']][:, None]
+                    valid = (state >= 0) & (destination >= 0) & match.any(axis=1)
+                    skipped += len(batch) - int(valid.sum())
+                    if not valid.any():
+                        continue
+
+                    self._remember_many(state[valid], match[valid].argmax(axis=1),
+                                        destination[valid], batch['reward'][valid])
+                    applied += int(valid.sum())
+                    for _ in range(max(1, round(valid.sum() * replay_ratio))):
+                        max_td = max(max_td, self._replay_step())
+        return _offline_result(applied, skipped, max_td)
+
+    def save(self, path):
+        """Save the network weights and learning parameters to directory path"""
+        self._ensure_model()
+        arrays = {}
+        for i, (W, b) in enumerate(self.layers):
+            arrays[f'W{i}'], arrays[f'b{i}'] = W, b
+        _save_snapshot(self, path, **arrays)
+
+    @classmethod
+    def load(cls, network, path, mmap_mode=None):
+        """Load a router saved with save() on top of network"""
+        router, arrays = _load_snapshot(cls, network, path, mmap_mode)
+        router.hidden = tuple(router.hidden)
+        router._ensure_model()
+        router.layers = [[np.array(arrays[f'W{i}']), np.array(arrays[f'b{i}'])]
+                         for i in range(len(router.layers))]
+        router._target = [[W.copy(), b.copy()] for W, b in router.layers]
+        return router
+
+class ConvergenceTrainer:
+    """Train a Q-learning router until its values and policy settle.
+
+    Each round trains one episode per (source, destination) pair (batched
+    when the router supports train_batch), then records max |ΔQ|, mean
+    episode reward, how many greedy paths changed and the fraction of pairs
+    routed. Training stops once max |ΔQ| has stayed below tolerance with no
+    greedy path changing for `patience` rounds in a row.
+    """
+
+    def __init__(self, router, tolerance=0.5, patience=5):
+        self.router = router
+        self.tolerance = tolerance
+        self.patience = patience
+        self.history = {name: [] for name in (
+            'round', 'episodes', 'max_delta_q', 'mean_reward',
+            'policy_changes', 'success_rate', 'seconds')}
+        self.converged_at = None  # Total training episodes at convergence
+        # Kept between train() calls so training can resume round by round
+        self._previous_paths = None
+        self._calm_rounds = 0
+
+    def train(self, pairs, max_rounds, on_round=None):
+        """Run up to max_rounds rounds; on_round(stats) is called after each.
+
+        Returns True if training converged before running out of rounds.
+        """
+        for _ in range(max_rounds):
+            start = time.perf_counter()
+            max_delta, mean_reward = self._train_round(pairs)
+            seconds = time.perf_counter() - start
+
+            # Policy stability: compare greedy paths with the previous round
+            paths = [self.router.find_best_path(s, d) for s, d in pairs]
+            previous = self._previous_paths
+            if previous is None or len(previous) != len(paths):
+                changes = len(paths)
+            else:
+                changes = sum(a != b for a, b in zip(paths, previous))
+            self._previous_paths = paths
+
+            stats = {
+                'round': len(self.history['round']) + 1,
+                'episodes': self.router.training_episodes,
+                'max_delta_q': max_delta,
+                'mean_reward': mean_reward,
+                'policy_changes': changes,
+                'success_rate': sum(path is not None for path in paths) / max(len(paths), 1),
+                'seconds': seconds,
+            }
+            for name, value in stats.items():
+                self.history[name].append(value)
+            if on_round:
+                on_round(stats)
+
+            calm = max_delta < self.tolerance and changes == 0
+            self._calm_rounds = self._calm_rounds + 1 if calm else 0
+            if self._calm_rounds >= self.patience:
+                self.converged_at = self.router.training_episodes
+                return True
+
+        return False
+
+    def _train_round(self, pairs):
+        """One episode per pair; returns (max |ΔQ|, mean episode reward)"""
+        if hasattr(self.router, 'train_batch'):
+            self.router.train_batch(pairs, 1)
+            batch = self.router.last_batch
+            return float(batch['max_delta_q'][0]), float(batch['mean_reward'][0])
+
+        max_delta, total_reward = 0, 0
+        for source, destination in pairs:
+            self.router.train_episode(source, destination)
+            max_delta = max(max_delta, self.router.last_episode['max_delta_q'])
+            total_reward += self.router.last_episode['reward']
+        return max_delta, total_reward / max(len(pairs), 1)
+
+    def to_frame(self):
+        """Training telemetry as a DataFrame, one row per round"""
+        return pd.DataFrame(self.history)
+
+def train_lockstep(q_values, neighbors, degrees, costs, sources, destinations,
+                   episodes, hyperparameters, rng, recorder=None):
+    """Vectorized Q-learning episodes, one lane per (source, destination).
+
+    Trains q_values[destination, node, slot] in place over the link arrays
+    (neighbors, degrees) and per-slot costs of a topology, with
+    hyperparameters = (learning_rate, discount_factor, epsilon, max_steps)
+    as in ArrayQLearningRouter. sources and destinations are node ID arrays.
+
+    Every step's transitions go to recorder.record_many() if a recorder is
+    given. Returns per-round arrays (success rate, max |ΔQ|, total reward).
+    """
+    learning_rate, discount_factor, epsilon, max_steps = hyperparameters
+    lanes = np.arange(len(sources))
+    success = np.zeros(episodes)
+    max_delta = np.zeros(episodes)
+    total_reward = np.zeros(episodes)
+
+    for episode in range(episodes):
+        current = sources.copy()
+        # Nodes each lane has left so far; doubles as its visited set
+        trace = np.full((len(sources), max_steps), -1, dtype=np.int32)
+
+        for step in range(max_steps):
+            visited = (trace[:, :step] == current[:, None]).any(axis=1)
+            active = (current != destinations) & ~visited & (degrees[current] > 0)
+            if not active.any():
+                break
+            lane = lanes[active]
+            state = current[active]
+            destination = destinations[active]
+            trace[lane, step] = state
+
+            # Epsilon-greedy slot choice per lane
+            explore = rng.random(len(lane)) < epsilon
+            random_slot = (rng.random(len(lane)) * degrees[state]).astype(np.int32)
+            greedy_slot = np.argmax(q_values[destination, state], axis=1)
+            slot = np.where(explore, random_slot, greedy_slot)
+            next_node = neighbors[state, slot]
+
+            # Negative cost as reward, bonus for reaching destination
+            arrived = next_node == destination
+            reward = -costs[state, slot] + np.where(arrived, 100, 0)
+            if recorder is not None:
+                recorder.record_many(state, next_node, reward, next_node, destination)
+
+            terminal = arrived | (degrees[next_node] == 0)
+            max_next_q = np.where(
+                terminal, 0, q_values[destination, next_node].max(axis=1))
+            current_q = q_values[destination, state, slot]
+            delta = learning_rate * (reward + discount_factor * max_next_q - current_q)
+            q_values[destination, state, slot] = current_q + delta
+            max_delta[episode] = max(max_delta[episode], np.abs(delta).max())
+            total_reward[episode] += reward.sum()
+
+            current[active] = next_node
+
+        success[episode] = np.mean(current == destinations) if len(sources) else 0
+
+    return success, max_delta, total_reward
+
+
+def _share_array(values):
+    """Copy an array into a new shared memory block"""
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[...] = values
+    return shm, (shm.name, values.shape, values.dtype.str)
+
+
+def _attach_array(spec, shm=None):
+    """View a shared memory block created by _share_array as an array"""
+    name, shape, dtype = spec
+    shm = shm or shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _train_shard(job):
+    """Process-pool worker for ArrayQLearningRouter.train_parallel"""
+    specs, pairs, episodes, hyperparameters, seed = job
+    sources = np.array([source for source, _ in pairs], dtype=np.int32)
+    destinations = np.array([destination for _, destination in pairs], dtype=np.int32)
+    blocks = [shared_memory.SharedMemory(name=spec[0]) for spec in specs]
+    arrays = [_attach_array(spec, shm) for spec, shm in zip(specs, blocks)]
+    try:
+        return train_lockstep(*arrays, sources, destinations, episodes,
+                              hyperparameters, np.random.default_rng(seed))
+    finally:
+        del arrays  # Views must be released before the blocks are closed
+        for shm in blocks:
+            shm.close()
+
+# =============================================================================
+# 4. NETWORK VISUALIZATION
+# =============================================================================
+
+def create_network_visualization(network, path=None, title="Network Topology"):
+    """Create network visualization using NetworkX and Matplotlib"""
+    renderer = _RENDERERS.get(network)
+    if renderer is None:
+        renderer = _RENDERERS[network] = NetworkRenderer(network)
+    renderer.draw(path, title)
     return plt
 
+# One renderer (and its cached layout/base layer) per live network
+_RENDERERS = weakref.WeakKeyDictionary()
+
+class NetworkRenderer:
+    """Draws a network as a cached static base layer plus live overlays.
+
+    Node positions and an image of all links are computed once per link
+    structure (links_version); each draw only adds congested links, the
+    current path and, on small graphs, nodes and cost labels. Graphs with
+    more than detail_limit nodes are drawn without labels and with at most
+    max_edges randomly sampled base links.
+    """
+
+    # Fixed layout for the demo network, for consistency with the docs
+    DEMO_POSITIONS = {
+        'A': (0, 1), 'B': (2, 1), 'C': (0, 0),
+        'D': (2, 0), 'E': (1, 0.5), 'F': (3, 0.5)
+    }
+
+    def __init__(self, network, detail_limit=2000, label_limit=50,
+                 max_edges=20000, figsize=(10, 6), dpi=100):
+        self.network = network
+        self.detail_limit = detail_limit
+        self.label_limit = label_limit
+        self.max_edges = max_edges
+        self.figsize = figsize
+        self.dpi = dpi
+        self._positions = None
+        self._base = None
+        self._version = None
+
+    def _refresh(self):
+        """Recompute positions and the base layer after link changes"""
+        if self._version == self.network.links_version:
+            return
+        self._positions = self._compute_positions()
+        self._base = self._render_base()
+        self._version = self.network.links_version
+
+    def _compute_positions(self):
+        """Node ID -> (x, y) array, using a layout that scales with size"""
+        nodes = self.network.nodes
+        if set(nodes) == set(self.DEMO_POSITIONS):
+            return np.array([self.DEMO_POSITIONS[node] for node in nodes], dtype=float)
+        if len(nodes) < 500:
+            G = nx.Graph()
+            G.add_nodes_from(nodes)
+            G.add_edges_from((u, v) for u, v, _ in self.network.edges)
+            layout = nx.spring_layout(G, seed=0)
+            return np.array([layout[node] for node in nodes], dtype=float)
+        return self._pivot_mds()
+
+    def _pivot_mds(self, num_pivots=50):
+        """Pivot MDS layout from BFS hop distances to a few pivot nodes"""
+        nodes = self.network.nodes
+        ids = self.network.node_ids
+        adjacency = self.network.adjacency
+        rng = random.Random(0)
+        pivots = rng.sample(nodes, min(num_pivots, len(nodes)))
+
+        distances = np.zeros((len(nodes), len(pivots)))
+        for column, pivot in enumerate(pivots):
+            hops = np.full(len(nodes), -1.0)
+            hops[ids[pivot]] = 0
+            frontier = [pivot]
+            depth = 0
+            while frontier:
+                depth += 1
+                next_frontier = []
+                for node in frontier:
+                    for neighbor in adjacency[node]:
+                        if hops[ids[neighbor]] < 0:
+                            hops[ids[neighbor]] = depth
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+            hops[hops < 0] = depth + 1  # Unreachable: just beyond the farthest
+            distances[:, column] = hops
+
+        # Double-center the squared distances and project on the top 2 components
+        squared = distances ** 2
+        centered = -0.5 * (squared - squared.mean(axis=0) - squared.mean(axis=1)[:, None]
+                           + squared.mean())
+        u, s, _ = np.linalg.svd(centered, full_matrices=False)
+        return u[:, :2] * s[:2]
+
+    def _limits(self):
+        """Axis limits around all nodes with a small margin"""
+        low, high = self._positions.min(axis=0), self._positions.max(axis=0)
+        margin = np.maximum((high - low) * 0.08, 0.2 if len(self._positions) < 10 else 1e-3)
+        return (low[0] - margin[0], high[0] + margin[0],
+                low[1] - margin[1], high[1] + margin[1])
+
+    def _segments(self, links):
+        """Line segments for (node1, node2) links"""
+        ids = self.network.node_ids
+        return [(self._positions[ids[u]], self._positions[ids[v]]) for u, v in links]
+
+    def _render_base(self):
+        """Rasterize all links (and, on large graphs, nodes) to an RGBA image"""
+        figure = Figure(figsize=self.figsize, dpi=self.dpi)
+        FigureCanvasAgg(figure)
+        axes = figure.add_axes([0, 0, 1, 1])
+        axes.set_axis_off()
+        x0, x1, y0, y1 = self._limits()
+        axes.set_xlim(x0, x1)
+        axes.set_ylim(y0, y1)
+
+        large = len(self.network.nodes) > self.detail_limit
+        links = [(u, v) for u, v, _ in self.network.edges]
+        if len(links) > self.max_edges:
+            links = random.Random(0).sample(links, self.max_edges)
+        axes.add_collection(LineCollection(
+            self._segments(links), colors='gray', alpha=0.1 if large else 0.3,
+            linewidths=0.3 if large else 2))
+        if large:
+            axes.scatter(self._positions[:, 0], self._positions[:, 1],
+                         s=1, c='steelblue', alpha=0.5, linewidths=0)
+
+        figure.canvas.draw()
+        return np.asarray(figure.canvas.buffer_rgba()).copy()
+
+    def draw(self, path=None, title="Network Topology"):
+        """Draw the cached base layer plus congestion and path overlays"""
+        self._refresh()
+        network = self.network
+        small = len(network.nodes) <= self.detail_limit
+
+        plt.figure(figsize=self.figsize)
+        axes = plt.gca()
+        x0, x1, y0, y1 = self._limits()
+        axes.imshow(self._base, extent=(x0, x1, y0, y1), aspect='auto',
+                    interpolation='nearest', zorder=0)
+        axes.set_xlim(x0, x1)
+        axes.set_ylim(y0, y1)
+
+        # Draw congested edges in red
+        congested_edges = {_link_key(u, v) for u, v in network.congestion
+                           if v in network.adjacency.get(u, ())}
+        if congested_edges:
+            axes.add_collection(LineCollection(
+                self._segments(congested_edges), colors='red',
+                linewidths=4 if small else 1, alpha=0.8, zorder=1))
+
+        # Draw current path in blue
+        if path and len(path) > 1:
+            path_edges = [(path[i], path[i+1]) for i in range(len(path)-1)]
+            axes.add_collection(LineCollection(
+                self._segments(path_edges), colors='blue',
+                linewidths=5 if small else 2, alpha=0.9, zorder=2))
+
+        if small:
+            # Draw nodes and labels
+            node_size = 1000 if len(network.nodes) <= self.label_limit else 30
+            axes.scatter(self._positions[:, 0], self._positions[:, 1], s=node_size,
+                         c='lightblue', alpha=0.9, zorder=3)
+            if len(network.nodes) <= self.label_limit:
+                for node, (x, y) in zip(network.nodes, self._positions):
+                    axes.text(x, y, str(node), fontsize=14, fontweight='bold',
+                              ha='center', va='center', zorder=4)
+
+            # Draw edge labels (costs)
+            if len(network.edges) <= self.label_limit:
+                for u, v, weight in network.edges:
+                    (xu, yu), (xv, yv) = self._segments([(u, v)])[0]
+                    label = str(weight)
+                    if _link_key(u, v) in congested_edges:
+                        label = f"{weight}×{CONGESTION_MULTIPLIER}"
+                    axes.text((xu + xv) / 2, (yu + yv) / 2, label, fontsize=10,
+                              ha='center', va='center', zorder=4,
+                              bbox=dict(boxstyle='round', fc='white', ec='white'))
+
+        plt.title(title, fontsize=16, fontweight='bold')
+        plt.axis('off')
+        plt.tight_layout()
+
 # =============================================================================
 # 5. UTILITY FUNCTIONS
 # =============================================================================
@@ -356,14 +2774,757 @@ def calculate_path_cost(network, path):
 
     return total_cost
 
+def optimal_costs(network, pairs):
+    """Congestion-aware optimal path cost for each pair (None if unreachable)"""
+    G = nx.Graph()
+    G.add_nodes_from(network.nodes)  # Isolated nodes too
+    for u, v, _ in network.edges:
+        G.add_edge(u, v, weight=network.get_actual_cost(u, v))
+    lengths = {}
+    for source in {s for s, _ in pairs}:
+        lengths[source] = nx.single_source_dijkstra_path_length(G, source)
+    return [lengths[s].get(d) for s, d in pairs]
+
+def path_quality(network, paths, optimum):
+    """Fraction of reachable pairs routed and mean optimality gap of the routed ones"""
+    gaps = []
+    for path, best in zip(paths, optimum):
+        cost = calculate_path_cost(network, path)
+        if path and math.isfinite(cost) and best:
+            gaps.append(cost / best - 1)
+    reachable = sum(best is not None for best in optimum)
+    return {
+        'path_found': len(gaps) / reachable if reachable else 0,
+        'optimality_gap_mean': float(np.mean(gaps)) if gaps else None,
+        'optimality_gap_max': float(np.max(gaps)) if gaps else None,
+    }
+
 def format_path(path):
     """Format path for display"""
     return ' → '.join(path) if path else 'No path found'
 
+class PathBuffer:
+    """Preallocated path of node IDs with a length field.
+
+    Routers reuse one buffer across calls to avoid per-episode list churn,
+    so copy() a result to keep it. Indexing and iterating yield node names,
+    looked up only then, so format_path() and calculate_path_cost() accept
+    a buffer as they would a list.
+    """
+
+    __slots__ = ('ids', 'length', 'names')
+
+    def __init__(self, capacity, names):
+        self.ids = array('i', bytes(4 * capacity))
+        self.length = 0
+        self.names = names  # Node names by ID (NetworkTopology.nodes)
+
+    @property
+    def capacity(self):
+        return len(self.ids)
+
+    def node_ids(self):
+        """The path as an array of node IDs"""
+        return self.ids[:self.length]
+
+    def to_list(self):
+        """The path as a list of node names"""
+        return [self.names[i] for i in self.ids[:self.length]]
+
+    def copy(self):
+        buffer = PathBuffer(self.length, self.names)
+        buffer.ids[:] = self.ids[:self.length]
+        buffer.length = self.length
+        return buffer
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_list()[index]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("path index out of range")
+        return self.names[self.ids[index]]
+
+    def __iter__(self):
+        names = self.names
+        return (names[i] for i in self.ids[:self.length])
+
+    def __repr__(self):
+        return f"PathBuffer({self.to_list()!r})"
+
+def _link_key(node1, node2):
+    """Direction-independent key for an undirected link"""
+    return (node1, node2) if node1 <= node2 else (node2, node1)
+
+def _q_stamp(router):
+    """What a cached route from router depends on besides the topology.
+
+    Learning routers bump q_version on every Q-value write, including the
+    sweeps and re-seeding they do on link changes; routers without Q-values
+    fall back to their training count (None for Dijkstra).
+    """
+    stamp = getattr(router, 'q_version', None)
+    return stamp if stamp is not None else getattr(router, 'training_episodes', None)
+
+class RouteCache:
+    """LRU cache of routes keyed by (router, source, destination).
+
+    Entries are valid for the topology version the cache last saw and for
+    the router's Q-values as of the lookup (see _q_stamp()). When a link
+    gets more expensive only the routes crossing it are dropped; when a link
+    gets cheaper, appears or disappears any route might change, so
+    everything is dropped.
+    """
+
+    def __init__(self, network, max_entries=1024):
+        self.network = network
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (router, source, destination) -> (path, stamp)
+        self.by_link = defaultdict(set)  # link -> keys whose path crosses it
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        # Last seen (base, actual) cost per link, to tell increases from decreases
+        self.link_costs = {_link_key(u, v): self._costs(u, v) for u, v, _ in network.edges}
+        self.version = network.version
+        network.subscribe(self.on_link_change)
+
+    def _costs(self, node1, node2):
+        return (self.network.get_base_cost(node1, node2),
+                self.network.get_actual_cost(node1, node2))
+
+    def get_route(self, router, source, destination):
+        """Return router's path from source to destination, computing on a miss"""
+        if self.version != self.network.version:
+            self.clear()  # Changed without a notification (e.g. a new node)
+        key = (router, source, destination)
+        stamp = _q_stamp(router)
+
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] == stamp:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+        if entry is not None:
+            self._drop(key)
+        path = router.find_path(source, destination)
+        self.entries[key] = (path, stamp)
+        for i in range(len(path or ()) - 1):
+            self.by_link[_link_key(path[i], path[i + 1])].add(key)
+
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+        return path
+
+    def on_link_change(self, node1, node2):
+        """Network listener: invalidate routes affected by node1-node2"""
+        link = _link_key(node1, node2)
+        old = self.link_costs.get(link, (float('inf'), float('inf')))
+        new = self._costs(node1, node2)
+        self.link_costs[link] = new
+
+        # Links appearing or disappearing also reshape the Q-table layout
+        structural = float('inf') in (old[0], new[0])
+        if structural or new[0] < old[0] or new[1] < old[1]:
+            self.invalidations += len(self.entries)
+            self.clear()
+        else:
+            keys = list(self.by_link.get(link, ()))
+            self.invalidations += len(keys)
+            for key in keys:
+                self._drop(key)
+        self.version = self.network.version
+
+    def _drop(self, key):
+        path, _ = self.entries.pop(key)
+        for i in range(len(path or ()) - 1):
+            keys = self.by_link.get(_link_key(path[i], path[i + 1]))
+            if keys is not None:
+                keys.discard(key)
+
+    def clear(self):
+        """Drop every cached route"""
+        self.entries.clear()
+        self.by_link.clear()
+        self.version = self.network.version
+
+    def stats(self):
+        """Hit/miss/eviction counters"""
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+class RoutingTable:
+    """Precomputed next hops for every (node, destination) pair.
+
+    next_hop[node, destination] is the neighbor ID a packet at node takes
+    towards destination (-1 if none), as a dense int32 matrix taken from
+    TraditionalRouter shortest-path trees or a Q-learning router's greedy
+    policy. It is rebuilt lazily whenever the topology version or the
+    router's Q-values change (for Dijkstra tables only link changes
+    count, since they ignore congestion). Memory is 8 bytes per node pair
+    (next hop plus neighbor slot), so this suits networks up to tens of
+    thousands of nodes.
+
+    Dijkstra next hops come from trees rooted at each destination, while
+    TraditionalRouter.find_path() searches from the source. Where several
+    shortest paths tie the two may pick different ones; costs always match.
+    """
+
+    def __init__(self, router, network=None):
+        self.router = router
+        self.network = network or router.network
+        self.next_hop = None
+        self.next_slot = None
+        self.built_for = None
+        self.frozen = False  # Set on snapshot() copies, which never rebuild
+
+    def _stamp(self):
+        # Dijkstra next hops use base costs, so congestion doesn't stale them
+        if isinstance(self.router, TraditionalRouter):
+            return ('links', self.network.links_version)
+        return (self.network.version, _q_stamp(self.router))
+
+    def refresh(self):
+        """Rebuild the tables if the topology or the router changed"""
+        if not self.frozen and self.built_for != self._stamp():
+            self.build()
+
+    def snapshot(self, network=None):
+        """Frozen copy of the current tables, for lookups while the router trains.
+
+        The copy never rebuilds and reads path costs from network (default:
+        this table's), which must have the same link layout as the network
+        the tables were built on.
+        """
+        self.refresh()
+        table = RoutingTable(self.router, network or self.network)
+        table.next_hop, table.next_slot = self.next_hop, self.next_slot
+        table.built_for = self.built_for
+        table.frozen = True
+        return table
+
+    @instrumented
+    def build(self):
+        """Compute next_hop and next_slot for all pairs"""
+        neighbors, _, degrees = self.network.get_link_arrays()
+        num_nodes = len(self.network.nodes)
+
+        if isinstance(self.router, TraditionalRouter):
+            next_hop = self._next_hops_from_trees(num_nodes)
+        elif isinstance(self.router, ApproxQLearningRouter):
+            next_hop = self.router.greedy_next_hops()
+        elif isinstance(self.router, ArrayQLearningRouter):
+            self.router._ensure_q_values()
+            slots = np.argmax(self.router.q_values, axis=2).T  # [node, destination]
+            next_hop = neighbors[np.arange(num_nodes)[:, None], slots]
+            next_hop[degrees == 0] = -1
+        else:
+            next_hop = self._next_hops_from_policy(num_nodes)
+        np.fill_diagonal(next_hop, -1)
+
+        # Slot of each next hop in its node's row of the link arrays, so costs
+        # can be read from get_actual_cost_array(); chunked to bound memory
+        next_slot = np.zeros_like(next_hop)
+        chunk = max(1, 2**22 // max(num_nodes * neighbors.shape[1], 1))
+        for start in range(0, num_nodes, chunk):
+            rows = slice(start, start + chunk)
+            matches = neighbors[rows, None, :] == next_hop[rows, :, None]
+            next_slot[rows] = np.argmax(matches, axis=2)
+
+        self.next_hop = next_hop
+        self.next_slot = next_slot
+        self.built_for = self._stamp()
+
+    def _next_hops_from_trees(self, num_nodes):
+        """Dijkstra tree rooted at each destination gives every node's next hop"""
+        ids = self.network.node_ids
+        next_hop = np.full((num_nodes, num_nodes), -1, dtype=np.int32)
+        for destination in self.network.nodes:
+            _, previous = self.router.shortest_path_tree(destination)
+            column = ids[destination]
+            for node, parent in previous.items():
+                next_hop[ids[node], column] = ids[parent]
+        return next_hop
+
+    def _next_hops_from_policy(self, num_nodes):
+        """Greedy action of a router's choose_action() for every pair"""
+        ids = self.network.node_ids
+        next_hop = np.full((num_nodes, num_nodes), -1, dtype=np.int32)
+        for node in self.network.nodes:
+            for destination in self.network.nodes:
+                if node != destination:
+                    action = self.router.choose_action(node, destination, training=False)
+                    if action is not None:
+                        next_hop[ids[node], ids[destination]] = ids[action]
+        return next_hop
+
+    @instrumented
+    def route_many(self, pairs, with_paths=True, max_hops=None):
+        """Route many pairs at once.
+
+        pairs is a list of (source, destination) names or an (N, 2) integer
+        array of node IDs. Returns (costs, hops): actual path costs (inf
+        when unreachable or looping, and for source == destination as in
+        calculate_path_cost()) and an (N, max_hops + 1) int32 array of node
+        IDs padded with -1, or just costs when with_paths is False.
+        """
+        self.refresh()
+        if isinstance(pairs, np.ndarray) and pairs.dtype.kind in 'iu':
+            pairs = pairs.astype(np.int64).reshape(-1, 2)
+        else:
+            ids = self.network.node_ids
+            pairs = np.array([(ids[s], ids[d]) for s, d in pairs], dtype=np.int64).reshape(-1, 2)
+        if max_hops is None:
+            max_hops = getattr(self.router, 'max_steps', len(self.network.nodes))
+
+        costs_array = self.network.get_actual_cost_array()
+        current = pairs[:, 0].copy()
+        destinations = pairs[:, 1]
+        costs = np.zeros(len(pairs))
+        hops = np.full((len(pairs), max_hops + 1), -1, dtype=np.int32) if with_paths else None
+        if with_paths:
+            hops[:, 0] = current
+
+        active = np.flatnonzero(current != destinations)
+        costs[current == destinations] = np.inf  # A one-node path has no cost
+        for step in range(1, max_hops + 1):
+            if len(active) == 0:
+                break
+            next_node = self.next_hop[current[active], destinations[active]]
+            stuck = next_node < 0
+            costs[active[stuck]] = np.inf
+            active, next_node = active[~stuck], next_node[~stuck]
+
+            slot = self.next_slot[current[active], destinations[active]]
+            costs[active] += costs_array[current[active], slot]
+            current[active] = next_node
+            if with_paths:
+                hops[active, step] = next_node
+            active = active[current[active] != destinations[active]]
+
+        costs[active] = np.inf  # Ran out of hops (routing loop)
+        return (costs, hops) if with_paths else costs
+
+    def path_names(self, hops):
+        """Turn one row of route_many() hops into a list of node names"""
+        return [self.network.nodes[i] for i in hops if i >= 0]
+
+class TransitionLog:
+    """Append-only log of (state, action, reward, next_state, destination) transitions.
+
+    A log is a directory holding nodes.json (node names, indexed by the IDs
+    in the records) and transitions.bin, fixed-size 24-byte records (int32
+    node IDs, float64 reward) appended in arrival order. Set one as a
+    router's or TrafficSimulator's recorder to capture transitions;
+    read_chunks() memory-maps the file, so offline training streams through
+    logs larger than RAM.
+    """
+
+    RECORD = np.dtype([('state', '<i4'), ('action', '<i4'), ('next_state', '<i4'),
+                       ('destination', '<i4'), ('reward', '<f8')])
+
+    def __init__(self, path, buffer_size=65536):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._nodes_path = os.path.join(path, 'nodes.json')
+        self._data_path = os.path.join(path, 'transitions.bin')
+        self.nodes = []
+        if os.path.exists(self._nodes_path):
+            with open(self._nodes_path) as f:
+                self.nodes = json.load(f)
+        self._attached = None  # Node list of the network last attached
+        self._buffer = np.empty(buffer_size, dtype=self.RECORD)
+        self._pending = 0
+
+    def attach(self, network):
+        """Record with network's node IDs; its nodes must extend the log's"""
+        if network.nodes is self._attached and len(network.nodes) == len(self.nodes):
+            return
+        if network.nodes[:len(self.nodes)] != self.nodes:
+            raise ValueError(f"transition log {self.path} was recorded for different nodes")
+        if len(network.nodes) > len(self.nodes):
+            # Nodes are only ever appended, so existing record IDs stay valid
+            self.nodes = list(network.nodes)
+            with open(self._nodes_path + '.tmp', 'w') as f:
+                json.dump(self.nodes, f)
+            os.replace(self._nodes_path + '.tmp', self._nodes_path)
+        self._attached = network.nodes
+
+    def record(self, state, action, reward, next_state, destination):
+        """Append one transition (node IDs)"""
+        if self._pending == len(self._buffer):
+            self.flush()
+        self._buffer[self._pending] = (state, action, next_state, destination, reward)
+        self._pending += 1
+
+    def record_many(self, state, action, reward, next_state, destination):
+        """Append a batch of transitions given as equal-length arrays"""
+        count = len(state)
+        if self._pending + count > len(self._buffer):
+            self.flush()
+        if count > len(self._buffer):
+            records = np.empty(count, dtype=self.RECORD)
+        else:
+            records = self._buffer[self._pending:self._pending + count]
+        records['state'] = state
+        records['action'] = action
+        records['next_state'] = next_state
+        records['destination'] = destination
+        records['reward'] = reward
+        if count > len(self._buffer):
+            with open(self._data_path, 'ab') as f:
+                f.write(records.tobytes())
+        else:
+            self._pending += count
+
+    def flush(self):
+        """Write buffered records to disk"""
+        if self._pending:
+            with open(self._data_path, 'ab') as f:
+                f.write(self._buffer[:self._pending].tobytes())
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        size = os.path.getsize(self._data_path) if os.path.exists(self._data_path) else 0
+        return size // self.RECORD.itemsize + self._pending
+
+    def read_chunks(self, chunk_size=1 << 20, start=0):
+        """Yield memory-mapped record arrays of up to chunk_size, from record start on.
+
+        Buffered records are flushed first; a partly written last record
+        (e.g. after a crash) is ignored.
+        """
+        self.flush()
+        count = len(self)
+        if count <= start:
+            return
+        records = np.memmap(self._data_path, dtype=self.RECORD, mode='r', shape=(count,))
+        for offset in range(start, count, chunk_size):
+            yield records[offset:offset + chunk_size]
+
+# =============================================================================
+# 6. TRAFFIC SIMULATION
+# =============================================================================
+
+# Event kinds for TrafficSimulator's heap
+_ARRIVAL, _DEPARTURE, _TICK = 0, 1, 2
+
+class TrafficSimulator:
+    """Discrete-event packet simulation driven by a traffic matrix.
+
+    Packets for each (source, destination) pair arrive as a Poisson process
+    at the rate given in `traffic` (packets/second), follow `router` hop by
+    hop and wait FIFO at each directed link, which serves `capacity`
+    packets/second (a number or a {(node1, node2): capacity} dict). Link
+    base costs count as propagation delay of `seconds_per_cost` each.
+
+    Every `tick` seconds the utilization of each link over the last
+    interval decides its congestion (above `congestion_threshold`), which is
+    written back to the network so both routers, caches and listeners see
+    it, and each router in `learners` trains `train_per_tick` episodes per
+    traffic pair.
+
+    If a `recorder` (TransitionLog) is given, every hop a packet completes
+    is appended to it as a transition with the routers' reward. A
+    `playback` (LinkLoadSeries) sets the link loads in effect at each tick.
+    """
+
+    def __init__(self, network, router, traffic, capacity=100.0, tick=1.0,
+                 congestion_threshold=0.8, queue_limit=1000, seconds_per_cost=0.001,
+                 learners=(), train_per_tick=1, recorder=None, playback=None, seed=None):
+        self.network = network
+        self.router = router
+        self.capacity = capacity
+        self.tick = tick
+        self.congestion_threshold = congestion_threshold
+        self.queue_limit = queue_limit
+        self.seconds_per_cost = seconds_per_cost
+        self.learners = list(learners)
+        self.train_per_tick = train_per_tick
+        self.recorder = recorder
+        self.playback = playback
+        self.random = random.Random(seed)
+
+        # Traffic matrix: {(source, destination): rate} or a node-ID indexed array
+        if isinstance(traffic, dict):
+            self.flows = [(s, d, rate) for (s, d), rate in traffic.items() if rate > 0]
+        else:
+            traffic = np.asarray(traffic)
+            self.flows = [(network.nodes[s], network.nodes[d], float(traffic[s, d]))
+                          for s, d in zip(*np.nonzero(traffic)) if s != d]
+
+        self.now = 0.0
+        self.events = []
+        self.sequence = itertools.count()  # Tie-breaker for simultaneous events
+        self.routes = {}  # (source, destination) -> path, cleared every tick
+        self.link_free_at = defaultdict(float)  # directed link -> time it goes idle
+        self.link_queued = defaultdict(int)  # directed link -> packets waiting or in service
+        self.link_busy = defaultdict(float)  # directed link -> service time this tick
+
+        self.injected = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.unroutable = 0
+        self.events_processed = 0
+        self.delays = array('d')
+        self.congestion_history = []  # (time, number of congested links)
+
+        for index, (_, _, rate) in enumerate(self.flows):
+            self._schedule(self.random.expovariate(rate), _ARRIVAL, index)
+        self._schedule(tick, _TICK, None)
+        if playback is not None:
+            playback.apply(network, self.now)
+
+    def _schedule(self, when, kind, data):
+        heapq.heappush(self.events, (when, next(self.sequence), kind, data))
+
+    def _link_capacity(self, link):
+        """Service rate (packets/second) of a directed link"""
+        if not isinstance(self.capacity, dict):
+            return self.capacity
+        return self.capacity.get(link, self.capacity.get((link[1], link[0]), 1.0))
+
+    def run(self, duration):
+        """Simulate until `duration` more seconds have passed; returns stats()"""
+        end = self.now + duration
+        events = self.events
+        while events and events[0][0] <= end:
+            self.now, _, kind, data = heapq.heappop(events)
+            self.events_processed += 1
+            if kind == _DEPARTURE:
+                self._depart(data)
+            elif kind == _ARRIVAL:
+                self._arrive(data)
+            else:
+                self._tick()
+        self.now = end
+        return self.stats()
+
+    def _arrive(self, index):
+        """New packet for flow index; schedule the flow's next arrival"""
+        source, destination, rate = self.flows[index]
+        self._schedule(self.now + self.random.expovariate(rate), _ARRIVAL, index)
+        self.injected += 1
+
+        key = (source, destination)
+        if key not in self.routes:
+            self.routes[key] = self.router.find_path(source, destination)
+        path = self.routes[key]
+        if not path or len(path) < 2:
+            self.unroutable += 1
+            return
+        self._enqueue([path, 0, self.now])
+
+    def _enqueue(self, packet):
+        """Queue packet [path, hop, created] on its next link"""
+        path, hop, _ = packet
+        link = (path[hop], path[hop + 1])
+        if self.link_queued[link] >= self.queue_limit:
+            self.dropped += 1
+            return
+
+        service = 1.0 / self._link_capacity(link)
+        start = max(self.now, self.link_free_at[link])
+        self.link_free_at[link] = start + service
+        self.link_busy[link] += service
+        self.link_queued[link] += 1
+
+        propagation = self.network.get_base_cost(*link) * self.seconds_per_cost
+        self._schedule(start + service + propagation, _DEPARTURE, packet)
+
+    def _depart(self, packet):
+        """Packet finished a hop: deliver it or queue it on the next link"""
+        path, hop, created = packet
+        self.link_queued[(path[hop], path[hop + 1])] -= 1
+        if self.recorder is not None:
+            self._record_hop(path[hop], path[hop + 1], path[-1])
+        packet[1] = hop = hop + 1
+        if hop == len(path) - 1:
+            self.delivered += 1
+            self.delays.append(self.now - created)
+        else:
+            self._enqueue(packet)
+
+    def _record_hop(self, node, next_node, destination):
+        """Append one completed hop to the recorder"""
+        self.recorder.attach(self.network)
+        ids = self.network.node_ids
+        reward = -self.network.get_actual_cost(node, next_node)
+        if next_node == destination:
+            reward += 100
+        self.recorder.record(ids[node], ids[next_node], reward, ids[next_node], ids[destination])
+
+    def _tick(self):
+        """Derive congestion from last interval's load and feed it back"""
+        congested = set()
+        for (u, v), busy in self.link_busy.items():
+            if busy / self.tick > self.congestion_threshold:
+                congested.add(_link_key(u, v))
+        current = {_link_key(u, v) for u, v in self.network.congestion}
+        for u, v in current - congested:
+            self.network.remove_congestion(u, v)
+        for u, v in congested - current:
+            self.network.add_congestion(u, v)
+        if self.playback is not None:
+            self.playback.apply(self.network, self.now)
+        self.link_busy.clear()
+        self.routes.clear()
+        self.congestion_history.append((self.now, len(congested)))
+
+        pairs = [(s, d) for s, d, _ in self.flows]
+        for learner in self.learners:
+            if hasattr(learner, 'train_batch'):
+                learner.train_batch(pairs, self.train_per_tick)
+            else:
+                for _ in range(self.train_per_tick):
+                    for source, destination in pairs:
+                        learner.train_episode(source, destination)
+
+        self._schedule(self.now + self.tick, _TICK, None)
+
+    def stats(self):
+        """Packet counters and end-to-end delay statistics so far"""
+        delays = np.frombuffer(self.delays, dtype=np.float64) if self.delays else None
+        return {
+            'time': self.now,
+            'injected': self.injected,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'unroutable': self.unroutable,
+            'in_flight': sum(self.link_queued.values()),
+            'events': self.events_processed,
+            'mean_delay': float(delays.mean()) if delays is not None else None,
+            'p99_delay': float(np.percentile(delays, 99)) if delays is not None else None,
+            'congested_links': len(self.network.congestion) // 2,
+        }
+
 # =============================================================================
-# 6. STREAMLIT WEB APPLICATION
+# 7. STREAMLIT WEB APPLICATION
 # =============================================================================
 
+class BackgroundTrainer:
+    """Train a router on a daemon thread, one job at a time.
+
+    Each round runs under the shared lock so page renders and congestion
+    changes never see a half-updated Q-table. Progress is published at most
+    every min_interval seconds for the UI to poll. Finished jobs' results are
+    kept by job ID until their session collects them with take_result();
+    only the newest max_results are kept for sessions that never come back.
+    """
+
+    _job_ids = itertools.count(1)  # Unique across trainers, so a reset never reuses an ID
+
+    def __init__(self, router, lock, min_interval=0.25, max_results=64):
+        self.router = router
+        self.lock = lock
+        self.min_interval = min_interval
+        self.max_results = max_results
+        self.job_id = None  # Running (or last started) job
+        self.progress = 0.0
+        self.status = ""
+        self.results = OrderedDict()  # job ID -> {'converged', 'trainer'}, oldest first
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, pairs, episodes):
+        """Start a training job; returns its ID, or None if one is still running"""
+        with self.lock:
+            if self.running:
+                return None
+            self.job_id = next(self._job_ids)
+            self.progress = 0.0
+            self.status = "Starting training..."
+            self.thread = threading.Thread(target=self._run, args=(self.job_id, list(pairs), episodes),
+                                           daemon=True)
+            self.thread.start()
+            return self.job_id
+
+    def take_result(self, job_id):
+        """Remove and return a finished job's result, or None if there is none"""
+        with self.lock:
+            return self.results.pop(job_id, None)
+
+    def _run(self, job_id, pairs, episodes):
+        trainer = ConvergenceTrainer(self.router)
+        converged = False
+        last_update = 0.0
+        try:
+            for round_number in range(1, episodes + 1):
+                with self.lock:
+                    converged = trainer.train(pairs, 1)
+                now = time.monotonic()
+                if converged or round_number == episodes or now - last_update >= self.min_interval:
+                    self.progress = round_number / episodes
+                    self.status = (f"Training episode {round_number}/{episodes} "
+                                   f"(max ΔQ {trainer.history['max_delta_q'][-1]:.2f})")
+                    last_update = now
+                if converged:
+                    break
+        finally:
+            with self.lock:
+                self.results[job_id] = {'converged': converged, 'trainer': trainer}
+                while len(self.results) > self.max_results:
+                    self.results.popitem(last=False)
+
+class SharedSimulation:
+    """Network, routers and route cache shared by every browser session"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self, warm_start=False):
+        """Rebuild everything from the demo network"""
+        with self.lock:
+            self.network = NetworkTopology()
+            self.traditional_router = TraditionalRouter(self.network)
+            self.path_engine = PathEngine(self.network, weight='actual')
+            # Link and congestion changes re-seed the affected Q-values
+            self.ai_router = QLearningRouter(self.network, transfer=True)
+            if warm_start:
+                self.ai_router.warm_start()
+            self.route_cache = RouteCache(self.network)
+            # A job still running keeps training the old router; it is simply dropped
+            self.trainer = BackgroundTrainer(self.ai_router, self.lock)
+
+@st.cache_resource
+def get_shared_simulation():
+    """One SharedSimulation per server process, created on first use"""
+    return SharedSimulation()
+
+def show_network(shared, path=None, title="Network Topology"):
+    """Render the network (and optional path) under the shared lock"""
+    with shared.lock:
+        fig = create_network_visualization(shared.network, path, title)
+        st.pyplot(fig)
+        plt.close()
+
 def main():
     """Main Streamlit application"""
 
@@ -378,15 +3539,15 @@ def main():
     st.title("🤖 AI vs Traditional Network Routing")
     st.markdown("### Compare how AI learns better routes than traditional methods!")
 
-    # Initialize session state
-    if 'network' not in st.session_state:
-        st.session_state.network = NetworkTopology()
-        st.session_state.traditional_router = TraditionalRouter(st.session_state.network)
-        st.session_state.ai_router = QLearningRouter(st.session_state.network)
-
-    network = st.session_state.network
-    traditional_router = st.session_state.traditional_router
-    ai_router = st.session_state.ai_router
+    # Shared across sessions; only pending job IDs live in session state
+    shared = get_shared_simulation()
+    network = shared.network
+    traditional_router = shared.traditional_router
+    ai_router = shared.ai_router
+    route_cache = shared.route_cache
+    trainer = shared.trainer
+    lock = shared.lock
+    poll = False
 
     # Sidebar controls
     st.sidebar.header("🎮 Controls")
@@ -396,10 +3557,12 @@ def main():
     destination = st.sidebar.selectbox("Destination Node", network.nodes, index=5)
 
     # Reset button
+    warm_start = st.sidebar.checkbox("Warm-start AI from Dijkstra", value=False,
+                                     help="Seed Q-values from shortest paths on reset")
     if st.sidebar.button("🔄 Reset Everything", type="secondary"):
-        st.session_state.network = NetworkTopology()
-        st.session_state.traditional_router = TraditionalRouter(st.session_state.network)
-        st.session_state.ai_router = QLearningRouter(st.session_state.network)
+        shared.reset(warm_start)
+        st.session_state.pop('ai_job', None)
+        st.session_state.pop('compare_job', None)
         st.rerun()
 
     # Congestion controls
@@ -412,14 +3575,15 @@ def main():
     )
 
     if st.sidebar.button("Apply Scenario"):
-        network.reset_congestion()
-        if scenario == "Congest B-D":
-            network.add_congestion('B', 'D')
-        elif scenario == "Congest A-B":
-            network.add_congestion('A', 'B')
-        elif scenario == "Congest Multiple":
-            network.add_congestion('B', 'D')
-            network.add_congestion('A', 'B')
+        with lock:
+            network.reset_congestion()
+            if scenario == "Congest B-D":
+                network.add_congestion('B', 'D')
+            elif scenario == "Congest A-B":
+                network.add_congestion('A', 'B')
+            elif scenario == "Congest Multiple":
+                network.add_congestion('B', 'D')
+                network.add_congestion('A', 'B')
         st.sidebar.success(f"Applied: {scenario}")
         st.rerun()
 
@@ -432,16 +3596,23 @@ def main():
     col3, col4 = st.sidebar.columns(2)
     if col3.button("Add"):
         if node1 != node2:
-            network.add_congestion(node1, node2)
+            with lock:
+                network.add_congestion(node1, node2)
             st.sidebar.success(f"Added congestion: {node1}-{node2}")
             st.rerun()
 
     if col4.button("Remove"):
         if node1 != node2:
-            network.remove_congestion(node1, node2)
+            with lock:
+                network.remove_congestion(node1, node2)
             st.sidebar.success(f"Removed congestion: {node1}-{node2}")
             st.rerun()
 
+    cache_stats = route_cache.stats()
+    st.sidebar.caption(f"Route cache: {cache_stats['hits']} hits, "
+                       f"{cache_stats['misses']} misses, "
+                       f"{cache_stats['evictions']} evictions")
+
     # Main content
     col1, col2 = st.columns(2)
 
@@ -451,18 +3622,16 @@ def main():
         st.write("*Always uses shortest path by base distance*")
 
         if st.button("Find Traditional Path", type="primary", key="trad"):
-            trad_path = traditional_router.find_shortest_path(source, destination)
-            trad_cost = calculate_path_cost(network, trad_path)
+            with lock:
+                trad_path = route_cache.get_route(traditional_router, source, destination)
+                trad_cost = calculate_path_cost(network, trad_path)
 
             if trad_path:
                 st.success(f"**Path:** {format_path(trad_path)}")
                 st.info(f"**Total Cost:** {trad_cost}")
 
                 # Show visualization
-                fig = create_network_visualization(network, trad_path, 
-                                                "Traditional Routing Path")
-                st.pyplot(fig)
-                plt.close()
+                show_network(shared, trad_path, "Traditional Routing Path")
             else:
                 st.error("❌ No path found!")
 
@@ -472,64 +3641,85 @@ def main():
         st.write("*Learns from experience and adapts*")
 
         # Training controls
-        episodes = st.slider("Training Episodes", 10, 200, 50, key="episodes")
+        episodes = st.slider("Max Training Episodes", 10, 200, 50, key="episodes")
 
         if st.button("Train AI & Find Path", type="primary", key="ai"):
-            # Training progress
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            # Train the AI
-            for episode in range(episodes):
-                ai_router.train_episode(source, destination)
-                progress_bar.progress((episode + 1) / episodes)
-                status_text.text(f"Training episode {episode + 1}/{episodes}")
-
-            status_text.text("Training complete! Finding best path...")
-
-            # Get best path
-            ai_path = ai_router.find_best_path(source, destination)
-            ai_cost = calculate_path_cost(network, ai_path)
-
-            status_text.empty()
-            progress_bar.empty()
-
-            if ai_path:
-                st.success(f"**Path:** {format_path(ai_path)}")
-                st.info(f"**Total Cost:** {ai_cost}")
-                st.info(f"**Training Episodes:** {ai_router.training_episodes}")
-
-                # Show visualization
-                fig = create_network_visualization(network, ai_path, 
-                                                "AI Routing Path")
-                st.pyplot(fig)
-                plt.close()
+            # Train in the background, stopping early once it has converged
+            job = trainer.start([(source, destination)], episodes)
+            if job is None:
+                st.warning("Another training run is in progress - try again shortly")
             else:
-                st.error("❌ No path found!")
+                st.session_state.ai_job = (job, source, destination, episodes)
+
+        if 'ai_job' in st.session_state:
+            job, job_source, job_destination, job_episodes = st.session_state.ai_job
+            # Check running first: a job that finishes in between still has its result
+            running = trainer.running and trainer.job_id == job
+            result = trainer.take_result(job)
+            if result is not None:
+                del st.session_state.ai_job
+                with lock:
+                    ai_path = route_cache.get_route(ai_router, job_source, job_destination)
+                    ai_cost = calculate_path_cost(network, ai_path)
+
+                if ai_path:
+                    st.success(f"**Path:** {format_path(ai_path)}")
+                    st.info(f"**Total Cost:** {ai_cost}")
+                    st.info(f"**Training Episodes:** {ai_router.training_episodes}")
+                    history = result['trainer'].to_frame()
+                    if result['converged']:
+                        st.caption(f"Converged after {len(history)} episodes")
+                    else:
+                        st.caption("Not converged yet - train more episodes")
+                    st.line_chart(history.set_index('round')[['max_delta_q', 'mean_reward']])
+
+                    # Show visualization
+                    show_network(shared, ai_path, "AI Routing Path")
+                else:
+                    st.error("❌ No path found!")
+            elif running:
+                st.progress(trainer.progress)
+                st.text(trainer.status)
+                poll = True
+            else:
+                # The job was dropped by a reset
+                del st.session_state.ai_job
 
     # Comparison section
     st.header("📊 Head-to-Head Comparison")
 
     if st.button("🆚 Compare Both Methods", type="secondary"):
-        with st.spinner("Comparing routing methods..."):
-            # Get traditional path
-            trad_path = traditional_router.find_shortest_path(source, destination)
-            trad_cost = calculate_path_cost(network, trad_path)
-
-            # Train AI and get best path
-            for _ in range(50):
-                ai_router.train_episode(source, destination)
-
-            ai_path = ai_router.find_best_path(source, destination)
-            ai_cost = calculate_path_cost(network, ai_path)
+        job = trainer.start([(source, destination)], 50)
+        if job is None:
+            st.warning("Another training run is in progress - try again shortly")
+        else:
+            st.session_state.compare_job = (job, source, destination)
+
+    if 'compare_job' in st.session_state:
+        job, job_source, job_destination = st.session_state.compare_job
+        running = trainer.running and trainer.job_id == job
+        result = trainer.take_result(job)
+        if result is not None:
+            del st.session_state.compare_job
+            with lock:
+                # Get traditional path
+                trad_path = route_cache.get_route(traditional_router, job_source, job_destination)
+                trad_cost = calculate_path_cost(network, trad_path)
+
+                ai_path = route_cache.get_route(ai_router, job_source, job_destination)
+                ai_cost = calculate_path_cost(network, ai_path)
+
+                # Congestion-aware Dijkstra: the best any router can do right now
+                best_path = route_cache.get_route(shared.path_engine, job_source, job_destination)
+                best_cost = calculate_path_cost(network, best_path)
 
             # Create comparison table
             comparison_data = {
-                'Method': ['Traditional (Dijkstra)', 'AI (Q-Learning)'],
-                'Path': [format_path(trad_path), format_path(ai_path)],
-                'Total Cost': [trad_cost, ai_cost],
-                'Adapts to Congestion': ['❌ No', '✅ Yes'],
-                'Learning Required': ['❌ No', '✅ Yes']
+                'Method': ['Traditional (Dijkstra)', 'AI (Q-Learning)', 'Congestion-aware Dijkstra'],
+                'Path': [format_path(trad_path), format_path(ai_path), format_path(best_path)],
+                'Total Cost': [trad_cost, ai_cost, best_cost],
+                'Adapts to Congestion': ['❌ No', '✅ Yes', '✅ Yes'],
+                'Learning Required': ['❌ No', '✅ Yes', '❌ No']
             }
 
             df = pd.DataFrame(comparison_data)
@@ -542,13 +3732,15 @@ def main():
                 st.info("🔄 **Traditional Routing** has lower cost in this scenario.")
             else:
                 st.info("🤝 **TIE** - Both methods found equally good paths.")
+        elif running:
+            st.info(f"Comparing routing methods... {trainer.status}")
+            poll = True
+        else:
+            del st.session_state.compare_job
 
     # Current network state
     st.header("🗺️ Current Network State")
-    fig = create_network_visualization(network, 
-                                     title="Network Topology (Red = Congested, Blue = Current Path)")
-    st.pyplot(fig)
-    plt.close()
+    show_network(shared, title="Network Topology (Red = Congested, Blue = Current Path)")
 
     # Educational content
     st.header("📚 How It Works")
@@ -637,5 +3829,10 @@ def main():
         - "This is how modern networks can become smarter and more efficient"
         """)
 
+    # Poll a running training job without blocking other sessions
+    if poll:
+        time.sleep(0.5)
+        st.rerun()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,466 @@
+"""
+⏱️ Headless benchmark for the routing simulator
+
+Generates synthetic topologies, runs the routers from app.py on them and
+prints a JSON report (latency percentiles, episodes/sec, convergence,
+peak memory and path-cost optimality gap).
+
+Run with: python benchmark.py --topology grid ba --nodes 400
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+from app import (METRICS, TOPOLOGIES, ApproxQLearningRouter, ArrayQLearningRouter,
+                 ConvergenceTrainer, LinkLoadSeries, NetworkTopology, PathEngine,
+                 QLearningRouter, RoutingTable, TraditionalRouter, build_topology,
+                 calculate_path_cost, optimal_costs, path_quality)
+
+# =============================================================================
+# 1. MEASUREMENT HELPERS
+# =============================================================================
+
+def percentiles(samples, scale=1000.0):
+    """p50/p90/p99/max of timing samples (seconds), scaled (default ms)"""
+    if not samples:
+        return None
+    values = np.asarray(samples) * scale
+    return {
+        'p50': float(np.percentile(values, 50)),
+        'p90': float(np.percentile(values, 90)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+def timed(function, *args):
+    """Run function(*args), returning (result, seconds)"""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def peak_memory(function, *args):
+    """Run function(*args) under tracemalloc, returning (result, peak KiB)"""
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / 1024
+
+# =============================================================================
+# 2. BENCHMARKS
+# =============================================================================
+
+def bench_traditional(network, pairs, optimum):
+    """Dijkstra point-to-point latency and single-source tree time"""
+    router = TraditionalRouter(network)
+    paths, latencies = [], []
+    for source, destination in pairs:
+        path, seconds = timed(router.find_shortest_path, source, destination)
+        paths.append(path)
+        latencies.append(seconds)
+    _, tree_seconds = timed(router.shortest_path_tree, pairs[0][0])
+    _, peak_kib = peak_memory(router.shortest_path_tree, pairs[0][0])
+
+    result = {
+        'latency_ms': percentiles(latencies),
+        'shortest_path_tree_ms': tree_seconds * 1000,
+        'peak_memory_kib': peak_kib,
+    }
+    result.update(path_quality(network, paths, optimum))
+    return result
+
+def bench_path_engine(network, pairs, optimum, k):
+    """Congestion-aware point-to-point searches and Yen's k-shortest paths"""
+    result = {}
+    for method in PathEngine.METHODS:
+        engine = PathEngine(network, weight='actual', method=method)
+        if method == 'alt':
+            _, result['alt_preprocess_ms'] = timed(engine.prepare_landmarks)
+            result['alt_preprocess_ms'] *= 1000
+        engine.find_path(*pairs[0])  # Build the adjacency lists outside the timing
+
+        paths, latencies, settled = [], [], []
+        for source, destination in pairs:
+            path, seconds = timed(engine.find_path, source, destination)
+            paths.append(path)
+            latencies.append(seconds)
+            settled.append(engine.last_settled)
+        result[method] = {
+            'latency_ms': percentiles(latencies),
+            'settled_fraction': float(np.mean(settled)) / len(network.nodes),
+        }
+        result[method].update(path_quality(network, paths, optimum))
+
+    engine = PathEngine(network, weight='actual')
+    latencies = [timed(engine.k_shortest_paths, s, d, k)[1] for s, d in pairs[:20]]
+    result['k_shortest'] = {'k': k, 'latency_ms': percentiles(latencies)}
+    return result
+
+def bench_q_dict(network, pairs, optimum, episodes, max_steps):
+    """Reference dict-backed QLearningRouter, trained one episode at a time"""
+    def train():
+        router = QLearningRouter(network)
+        router.max_steps = max_steps
+        for _ in range(episodes):
+            for source, destination in pairs:
+                router.train_episode(source, destination)
+        return router
+
+    router, seconds = timed(train)
+    _, peak_kib = peak_memory(train)
+    paths = [router.find_best_path(s, d) for s, d in pairs]
+    result = {
+        'episodes_per_sec': episodes * len(pairs) / seconds if seconds else None,
+        'peak_memory_kib': peak_kib,
+    }
+    result.update(path_quality(network, paths, optimum))
+    return result
+
+def bench_q_array(network, pairs, optimum, episodes, max_steps, seed):
+    """Array-backed router trained with train_batch until convergence"""
+    router = ArrayQLearningRouter(network)
+    router.max_steps = max_steps
+    router.rng = np.random.default_rng(seed)
+
+    trainer = ConvergenceTrainer(router)
+    trainer.train(pairs, episodes)
+    training_seconds = sum(trainer.history['seconds'])
+    paths = [router.find_best_path(s, d) for s, d in pairs]
+
+    latencies = []
+    for source, destination in pairs:
+        _, seconds = timed(router.find_best_path, source, destination)
+        latencies.append(seconds)
+
+    def train_one_round():
+        fresh = ArrayQLearningRouter(network)
+        fresh.max_steps = max_steps
+        fresh.train_batch(pairs, 1)
+
+    _, peak_kib = peak_memory(train_one_round)
+
+    result = {
+        'episodes_per_sec': router.training_episodes / training_seconds if training_seconds else None,
+        'convergence_episodes': trainer.converged_at,
+        'latency_ms': percentiles(latencies),
+        'q_table_bytes': int(router.q_values.nbytes),
+        'peak_memory_kib': peak_kib,
+    }
+    result.update(path_quality(network, paths, optimum))
+    result['telemetry'] = trainer.history
+    return result
+
+def bench_batch_sizes(network, sizes, episodes, max_steps, seed):
+    """Training throughput of train_batch vs. the dict router's train_episode per batch size.
+
+    Each size trains `episodes` episodes in total over that many random
+    pairs, so small batches run more rounds. train_batch pays a fixed NumPy
+    overhead per hop, so it only wins once batches are large enough.
+    """
+    rng = random.Random(seed)
+    result = []
+    for size in sizes:
+        pairs = [tuple(rng.sample(network.nodes, 2)) for _ in range(size)]
+        rounds = max(1, episodes // size)
+
+        def train_dict():
+            router = QLearningRouter(network)
+            router.max_steps = max_steps
+            for _ in range(rounds):
+                for source, destination in pairs:
+                    router.train_episode(source, destination)
+
+        def train_array():
+            router = ArrayQLearningRouter(network)
+            router.max_steps = max_steps
+            router.rng = np.random.default_rng(seed)
+            router.train_batch(pairs, rounds)
+
+        _, dict_seconds = timed(train_dict)
+        _, array_seconds = timed(train_array)
+        result.append({
+            'batch_size': size,
+            'dict_episodes_per_sec': rounds * size / dict_seconds if dict_seconds else None,
+            'batch_episodes_per_sec': rounds * size / array_seconds if array_seconds else None,
+            'speedup': dict_seconds / array_seconds if array_seconds else None,
+        })
+    return result
+
+def bench_q_approx(network, pairs, optimum, episodes, max_steps, seed):
+    """MLP function-approximation router: bounded memory, generalizes to unseen pairs"""
+    router = ApproxQLearningRouter(network, seed=seed)
+    router.max_steps = max_steps
+
+    # Train on half the pairs, then route all of them
+    half = max(len(pairs) // 2, 1)
+    trainer = ConvergenceTrainer(router)
+    trainer.train(pairs[:half], episodes)
+    training_seconds = sum(trainer.history['seconds'])
+    paths = [router.find_best_path(s, d) for s, d in pairs]
+
+    model_bytes = sum(W.nbytes + b.nbytes for W, b in router.layers)
+    model_bytes += router._embedding.nbytes + sum(column.nbytes for column in router._replay)
+    result = {
+        'episodes_per_sec': router.training_episodes / training_seconds if training_seconds else None,
+        'convergence_episodes': trainer.converged_at,
+        'model_bytes': int(model_bytes),
+        'trained_pairs': path_quality(network, paths[:half], optimum[:half]),
+        'unseen_pairs': path_quality(network, paths[half:], optimum[half:]),
+    }
+    return result
+
+def bench_q_warm_start(network, pairs, optimum, episodes, max_steps, seed):
+    """Episodes to converge from zeros vs. from Dijkstra seeds, before and after a link change"""
+    def converge(router):
+        router.max_steps = max_steps
+        router.rng = np.random.default_rng(seed)
+        start = router.training_episodes
+        trainer = ConvergenceTrainer(router)
+        trainer.train(pairs, episodes)
+        return trainer.converged_at - start if trainer.converged_at else None
+
+    # Work on a copy: the link change below must not leak into the other benchmarks
+    changed = NetworkTopology(list(network.nodes), list(network.edges))
+    for node1, node2 in network.congestion:
+        changed.add_congestion(node1, node2)
+
+    cold = ArrayQLearningRouter(changed)
+    warm = ArrayQLearningRouter(changed, transfer=True, incremental=True)
+    _, seed_seconds = timed(warm.warm_start)
+    result = {
+        'warm_start_seconds': seed_seconds,
+        'cold_episodes': converge(cold),
+        'warm_episodes': converge(warm),
+    }
+
+    # Cut a link of the longest route, as far along it as possible, and add
+    # a shortcut from its start to the cut link's near end; warm keeps its
+    # table, re-seeds the changed links and sweeps around them
+    link = change_link(changed, pairs)
+    if link is None:
+        return result
+    (node1, node2), shortcut = link
+    changed.remove_link(node1, node2)
+    changed.add_link(*shortcut)
+    changed_optimum = optimal_costs(changed, pairs)
+
+    result['after_change'] = {
+        'cold_episodes': converge(ArrayQLearningRouter(changed)),
+        'transfer_episodes': converge(warm),
+    }
+    result['after_change'].update(path_quality(
+        changed, [warm.find_best_path(s, d) for s, d in pairs], changed_optimum))
+    return result
+
+def change_link(network, pairs):
+    """A link to cut and a shortcut to add for the link-change benchmark.
+
+    Walks the longest shortest route among pairs backwards for a link that
+    is not a bridge (so cutting it disconnects nothing, isolated hosts
+    included) and whose route start is not already linked to the near end.
+    Returns ((node1, node2), (route[0], node1, cost)) or None.
+    """
+    router = TraditionalRouter(network)
+    route = max((router.find_shortest_path(s, d) or [] for s, d in pairs), key=len)
+    G = nx.Graph((u, v) for u, v, _ in network.edges)
+    bridges = {frozenset(link) for link in nx.bridges(G)}
+    for i in range(len(route) - 2, 1, -1):
+        node1, node2 = route[i], route[i + 1]
+        if (frozenset((node1, node2)) in bridges
+                or math.isfinite(network.get_base_cost(route[0], node1))):
+            continue
+        return (node1, node2), (route[0], node1, network.get_base_cost(route[0], route[1]))
+    return None
+
+def bench_playback(network, pairs, steps, episodes, max_steps, seed):
+    """Both routers under a random-walk link load series, one bulk update per step.
+
+    The Q router is trained on the unloaded network first, then one
+    train_batch round per step while the loads keep moving.
+    """
+    # Work on a copy so the loads don't leak into the other benchmarks
+    loaded = NetworkTopology(list(network.nodes), list(network.edges))
+    for node1, node2 in network.congestion:
+        loaded.add_congestion(node1, node2)
+    series = LinkLoadSeries.random_walk(loaded, steps, seed=seed)
+
+    traditional = TraditionalRouter(loaded)
+    router = ArrayQLearningRouter(loaded)
+    router.max_steps = max_steps
+    router.rng = np.random.default_rng(seed)
+    router.train_batch(pairs, episodes)
+    traditional_paths = [traditional.find_shortest_path(s, d) for s, d in pairs]
+
+    update_seconds, gaps = [], {'traditional': [], 'q_learning_array': []}
+    for when in series.times:
+        # Time the bulk update through to fresh cost arrays
+        start = time.perf_counter()
+        series.apply(loaded, when)
+        loaded.get_actual_cost_array()
+        update_seconds.append(time.perf_counter() - start)
+
+        router.train_batch(pairs, 1)
+        optimum = optimal_costs(loaded, pairs)
+        for name, paths in (('traditional', traditional_paths),
+                            ('q_learning_array',
+                             [router.find_best_path(s, d) for s, d in pairs])):
+            gaps[name].append(path_quality(loaded, paths, optimum))
+
+    result = {'steps': steps, 'cost_update_ms': percentiles(update_seconds)}
+    for name, qualities in gaps.items():
+        result[name] = {key: float(np.mean([q[key] for q in qualities if q[key] is not None]))
+                        for key in ('path_found', 'optimality_gap_mean')}
+    return result
+
+def bench_routing_table(network, num_queries, seed, checked=1000):
+    """Build time and bulk route_many throughput of precomputed Dijkstra tables.
+
+    The table's routes for the first `checked` queries are also compared
+    with TraditionalRouter.find_path(). The table follows destination-rooted
+    trees, so equal-cost ties may pick another path (tie_differences), but
+    base costs must match (cost_mismatches is a bug).
+    """
+    router = TraditionalRouter(network)
+    table = RoutingTable(router)
+    _, build_seconds = timed(table.build)
+    pairs = np.random.default_rng(seed).integers(len(network.nodes), size=(num_queries, 2))
+    _, seconds = timed(table.route_many, pairs, False)
+
+    _, hops = table.route_many(pairs[:checked], max_hops=len(network.nodes))
+    cost_mismatches = tie_differences = 0
+    for (source, destination), row in zip(pairs[:checked].tolist(), hops):
+        path = router.find_path(network.nodes[source], network.nodes[destination])
+        table_path = table.path_names(row)
+        if table_path[-1] != network.nodes[destination]:
+            table_path = None
+        if base_path_cost(network, table_path) != base_path_cost(network, path):
+            cost_mismatches += 1
+        elif table_path != path:
+            tie_differences += 1
+    return {
+        'build_seconds': build_seconds,
+        'queries_per_sec': num_queries / seconds if seconds else None,
+        'cost_mismatches': cost_mismatches,
+        'tie_differences': tie_differences,
+    }
+
+def base_path_cost(network, path):
+    """Sum of base link costs along path (None without a path)"""
+    if path is None:
+        return None
+    return sum(network.get_base_cost(u, v) for u, v in zip(path, path[1:]))
+
+def bench_path_cost(network, paths):
+    """calculate_path_cost latency in microseconds"""
+    latencies = [timed(calculate_path_cost, network, path)[1] for path in paths if path]
+    return {'latency_us': percentiles(latencies, scale=1e6)}
+
+def run_benchmark(kind, args):
+    """Benchmark every router on one synthetic topology"""
+    rng = random.Random(args.seed)
+    network, build_seconds = timed(build_topology, kind, args.nodes, rng, args.congestion)
+    pairs = [tuple(rng.sample(network.nodes, 2)) for _ in range(args.queries)]
+    optimum = optimal_costs(network, pairs)
+    max_steps = args.max_steps or len(network.nodes)
+
+    result = {
+        'topology': kind,
+        'nodes': len(network.nodes),
+        'links': len(network.edges),
+        'congested_links': len(network.congestion) // 2,
+        'build_seconds': build_seconds,
+        'traditional': bench_traditional(network, pairs, optimum),
+        'path_engine': bench_path_engine(network, pairs, optimum, args.k_paths),
+        'q_learning_array': bench_q_array(network, pairs, optimum, args.episodes,
+                                          max_steps, args.seed),
+    }
+    if not args.skip_approx:
+        result['q_learning_approx'] = bench_q_approx(network, pairs, optimum, args.episodes,
+                                                     max_steps, args.seed)
+    if not args.skip_warm_start:
+        result['q_learning_warm_start'] = bench_q_warm_start(network, pairs, optimum, args.episodes,
+                                                             max_steps, args.seed)
+    if args.playback_steps:
+        result['playback'] = bench_playback(network, pairs, args.playback_steps,
+                                            args.episodes, max_steps, args.seed)
+    if not args.skip_dict:
+        result['q_learning_dict'] = bench_q_dict(network, pairs, optimum,
+                                                 args.episodes, max_steps)
+        if args.batch_sizes:
+            result['train_batch_sizes'] = bench_batch_sizes(network, args.batch_sizes,
+                                                            args.batch_episodes, max_steps,
+                                                            args.seed)
+    if not args.skip_table:
+        result['routing_table'] = bench_routing_table(network, 100 * args.queries, args.seed)
+    router = TraditionalRouter(network)
+    result['path_cost'] = bench_path_cost(
+        network, [router.find_shortest_path(s, d) for s, d in pairs])
+    return result
+
+# =============================================================================
+# 3. COMMAND LINE
+# =============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the routing simulator")
+    parser.add_argument('--topology', nargs='+', choices=sorted(TOPOLOGIES),
+                        default=['grid'], help="topology families to generate")
+    parser.add_argument('--nodes', type=int, default=100, help="approximate node count")
+    parser.add_argument('--queries', type=int, default=200,
+                        help="random (source, destination) pairs to route")
+    parser.add_argument('--episodes', type=int, default=50,
+                        help="training episodes per pair for the Q-learning routers")
+    parser.add_argument('--max-steps', type=int, default=None,
+                        help="Q-learning hop limit (default: node count)")
+    parser.add_argument('--congestion', type=float, default=0.1,
+                        help="fraction of links to congest")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-dict', action='store_true',
+                        help="skip the slow dict-backed QLearningRouter")
+    parser.add_argument('--batch-sizes', type=int, nargs='*', default=[10, 100, 1000, 10000],
+                        help="pairs per train_batch call to compare with the dict router")
+    parser.add_argument('--batch-episodes', type=int, default=20000,
+                        help="episodes trained per batch size")
+    parser.add_argument('--skip-approx', action='store_true',
+                        help="skip the function-approximation router")
+    parser.add_argument('--skip-warm-start', action='store_true',
+                        help="skip the cold vs. warm-start convergence comparison")
+    parser.add_argument('--k-paths', type=int, default=4,
+                        help="paths per query for the k-shortest-paths benchmark")
+    parser.add_argument('--playback-steps', type=int, default=20,
+                        help="link load snapshots to play back (0 to skip)")
+    parser.add_argument('--skip-table', action='store_true',
+                        help="skip building all-pairs routing tables (O(nodes^2) memory)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="collect router hot-path counters and timers (adds overhead)")
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    METRICS.enabled = args.metrics
+    report = {
+        'config': vars(args),
+        'results': [run_benchmark(kind, args) for kind in args.topology],
+    }
+    if args.metrics:
+        report['metrics'] = METRICS.to_dict()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,340 @@
+"""
+📡 Multi-agent Q-routing for the routing simulator
+
+Boyan-Littman Q-routing: every node owns a table of estimated delivery
+costs Q_x(d, y) for each destination d and neighbor y. When x forwards a
+packet to y, y replies with its own best estimate t = min_z Q_y(d, z) and x
+updates Q_x(d, y) += η (cost(x, y) + t - Q_x(d, y)). Nodes are split into
+shards, each run as an asyncio task, and packets and estimate replies
+travel between them as messages, so learning progress can be measured
+against message overhead.
+
+Run with: python multi_agent.py --topology grid --nodes 100 --feedback 1.0 0.5 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+from collections import deque
+
+import numpy as np
+
+from app import (METRICS, TOPOLOGIES, build_topology, instrumented, optimal_costs,
+                 path_quality)
+
+# Message kinds
+_PACKET, _ESTIMATE = 0, 1
+
+# =============================================================================
+# 1. NODE AGENTS
+# =============================================================================
+
+class NodeAgent:
+    """One node's local state: its links and its own Q-table"""
+
+    __slots__ = ('node', 'neighbors', 'q')
+
+    def __init__(self, node, neighbors, num_nodes):
+        self.node = node
+        self.neighbors = neighbors  # Neighbor IDs in link-array slot order
+        self.q = np.zeros((num_nodes, len(neighbors)))  # [destination, slot] -> estimated cost
+
+    def best(self, destination):
+        """(slot, estimate) of the cheapest neighbor towards destination"""
+        row = self.q[destination]
+        slot = int(np.argmin(row))
+        return slot, float(row[slot])
+
+class _Packet:
+    """A packet in flight; its trace doubles as the episode's path"""
+
+    __slots__ = ('node', 'destination', 'path', 'cost', 'delivered')
+
+    def __init__(self, source, destination):
+        self.node = source
+        self.destination = destination
+        self.path = [source]
+        self.cost = 0.0
+        self.delivered = False
+
+# =============================================================================
+# 2. MULTI-AGENT ROUTER
+# =============================================================================
+
+class MultiAgentQRouter:
+    """Distributed Q-routing: per-node agents learning from neighbor replies.
+
+    Shares the train_episode/find_best_path interface of the centralized
+    routers. train_sharded() runs many packets at once with one asyncio
+    task per shard of nodes. feedback is the probability that a hop sends
+    its estimate back, trading learning speed for fewer control messages.
+    """
+
+    def __init__(self, network, shards=4, feedback=1.0, seed=None):
+        self.network = network
+        self.learning_rate = 0.5
+        self.epsilon = 0.1  # Exploration rate
+        self.max_steps = 10  # Hop limit per packet / path walk
+        self.feedback = feedback
+        self.shards = shards
+        self.training_episodes = 0
+        self.last_episode = None  # Reward and max |ΔQ| of the latest episode
+        self.messages = {'packets': 0, 'estimates': 0, 'cross_shard': 0}
+        self.rng = random.Random(seed)
+        self.agents = None
+        self._layout = None  # Link arrays the agents were built for
+
+    def _ensure_agents(self):
+        """(Re)build the agents when the topology structure changed"""
+        neighbors, _, degrees = self.network.get_link_arrays()
+        if self._layout is not neighbors:
+            num_nodes = len(self.network.nodes)
+            self.agents = [NodeAgent(i, neighbors[i, :degrees[i]].tolist(), num_nodes)
+                           for i in range(num_nodes)]
+            # Contiguous blocks of node IDs per shard
+            self.shard_of = [i * self.shards // max(num_nodes, 1) for i in range(num_nodes)]
+            self._layout = neighbors
+        return self.agents
+
+    def _handle(self, message, costs, send):
+        """Process one message at its node, passing new messages to send().
+
+        Returns the absolute Q change it caused (0 for packets).
+        """
+        if message[0] == _ESTIMATE:
+            _, node, destination, slot, estimate = message
+            row = self.agents[node].q[destination]
+            delta = self.learning_rate * (costs[node, slot] + estimate - row[slot])
+            row[slot] += delta
+            return abs(delta)
+
+        _, packet, sender, sender_slot = message
+        node, destination = packet.node, packet.destination
+        agent = self.agents[node]
+
+        # Tell the sender how far we think we are from the destination
+        if sender is not None and self.rng.random() < self.feedback:
+            estimate = 0.0 if node == destination else agent.best(destination)[1]
+            send((_ESTIMATE, sender, destination, sender_slot, estimate), node)
+
+        if node == destination:
+            packet.delivered = True
+            return 0
+        if len(packet.path) > self.max_steps or not agent.neighbors:
+            return 0  # Dropped
+
+        if self.rng.random() < self.epsilon:
+            slot = self.rng.randrange(len(agent.neighbors))  # Explore
+        else:
+            slot = agent.best(destination)[0]
+        packet.node = agent.neighbors[slot]
+        packet.cost += costs[node, slot]
+        packet.path.append(packet.node)
+        send((_PACKET, packet, node, slot), node)
+        return 0
+
+    def _count(self, message, origin):
+        """Tally a message sent from node origin"""
+        self.messages['packets' if message[0] == _PACKET else 'estimates'] += 1
+        target = message[1].node if message[0] == _PACKET else message[1]
+        if origin is not None and self.shard_of[origin] != self.shard_of[target]:
+            self.messages['cross_shard'] += 1
+        return self.shard_of[target]
+
+    def _finish(self, packets, max_delta):
+        """Episode bookkeeping shared by both training drivers"""
+        self.training_episodes += len(packets)
+        rewards = [-packet.cost + (100 if packet.delivered else 0) for packet in packets]
+        self.last_episode = {'reward': float(np.mean(rewards)) if rewards else 0.0,
+                             'max_delta_q': float(max_delta)}
+        if METRICS.enabled:
+            METRICS.count('episodes', len(packets))
+
+    @instrumented
+    def train_episode(self, source, destination):
+        """Send one packet, processing its messages in order"""
+        self._ensure_agents()
+        costs = self.network.get_actual_cost_array()
+        ids = self.network.node_ids
+        packet = _Packet(ids[source], ids[destination])
+        queue = deque()
+
+        def send(message, origin):
+            self._count(message, origin)
+            queue.append(message)
+
+        send((_PACKET, packet, None, None), None)
+        max_delta = 0
+        while queue:
+            max_delta = max(max_delta, self._handle(queue.popleft(), costs, send))
+
+        self._finish([packet], max_delta)
+        return [self.network.nodes[i] for i in packet.path]
+
+    def train_sharded(self, pairs, episodes=1):
+        """Run train_async() to completion; returns the delivered fraction per round"""
+        return asyncio.run(self.train_async(pairs, episodes))
+
+    async def train_async(self, pairs, episodes=1):
+        """Inject one packet per pair per round and let the shards route them.
+
+        Every shard is an asyncio task draining its own inbox; a round ends
+        when no message is left anywhere.
+        """
+        self._ensure_agents()
+        ids = self.network.node_ids
+        inboxes = [asyncio.Queue() for _ in range(self.shards)]
+        idle = asyncio.Event()
+        state = {'pending': 0, 'max_delta': 0}
+        delivered = []
+
+        def send(message, origin):
+            inboxes[self._count(message, origin)].put_nowait(message)
+            state['pending'] += 1
+            idle.clear()
+
+        async def run_shard(inbox):
+            while True:
+                message = await inbox.get()
+                change = self._handle(message, costs, send)
+                state['max_delta'] = max(state['max_delta'], change)
+                state['pending'] -= 1
+                if state['pending'] == 0:
+                    idle.set()
+                await asyncio.sleep(0)  # Let the other shards interleave
+
+        tasks = [asyncio.create_task(run_shard(inbox)) for inbox in inboxes]
+        try:
+            for _ in range(episodes):
+                # Link costs may change between rounds
+                costs = self.network.get_actual_cost_array()
+                state['max_delta'] = 0
+                packets = [_Packet(ids[s], ids[d]) for s, d in pairs]
+                for packet in packets:
+                    send((_PACKET, packet, None, None), None)
+                if packets:
+                    await idle.wait()
+                self._finish(packets, state['max_delta'])
+                delivered.append(np.mean([p.delivered for p in packets]) if packets else 0)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return np.array(delivered)
+
+    def choose_action(self, state, destination, training=True):
+        """Next hop chosen by state's own agent"""
+        agents = self._ensure_agents()
+        ids = self.network.node_ids
+        agent = agents[ids[state]]
+        if not agent.neighbors:
+            return None
+        if training and self.rng.random() < self.epsilon:
+            return self.network.nodes[self.rng.choice(agent.neighbors)]  # Explore
+        slot, _ = agent.best(ids[destination])
+        return self.network.nodes[agent.neighbors[slot]]
+
+    def find_path(self, source, destination):
+        """Common routing entry point shared by all routers"""
+        return self.find_best_path(source, destination)
+
+    @instrumented
+    def find_best_path(self, source, destination):
+        """Follow each node's greedy choice (no exploration, no messages)"""
+        agents = self._ensure_agents()
+        ids = self.network.node_ids
+        destination_id = ids[destination]
+        current = ids[source]
+        path = [current]
+        visited = set()
+
+        for step in range(self.max_steps):
+            if current == destination_id or current in visited or not agents[current].neighbors:
+                break
+            visited.add(current)
+            slot, _ = agents[current].best(destination_id)
+            current = agents[current].neighbors[slot]
+            path.append(current)
+
+        if current != destination_id:
+            return None
+        return [self.network.nodes[i] for i in path]
+
+# =============================================================================
+# 3. CONVERGENCE VS MESSAGE OVERHEAD
+# =============================================================================
+
+def measure(network, pairs, optimum, feedback, args):
+    """Train round by round, recording path quality against messages sent"""
+    router = MultiAgentQRouter(network, shards=args.shards, feedback=feedback, seed=args.seed)
+    router.max_steps = args.max_steps or len(network.nodes)
+    rounds = []
+    converged_round = None
+
+    for round_number in range(1, args.rounds + 1):
+        router.train_sharded(pairs, 1)
+        paths = [router.find_best_path(s, d) for s, d in pairs]
+        quality = path_quality(network, paths, optimum)
+        rounds.append({'round': round_number, **router.messages, **quality})
+
+        gap = quality['optimality_gap_mean']
+        if (converged_round is None and quality['path_found'] == 1
+                and gap is not None and gap <= args.tolerance):
+            converged_round = round_number
+            if args.stop_on_convergence:
+                break
+
+    return {
+        'feedback': feedback,
+        'converged_round': converged_round,
+        'messages_to_converge': (rounds[converged_round - 1]['packets']
+                                 + rounds[converged_round - 1]['estimates']
+                                 if converged_round else None),
+        'rounds': rounds,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure multi-agent Q-routing convergence")
+    parser.add_argument('--topology', choices=sorted(TOPOLOGIES), default='grid')
+    parser.add_argument('--nodes', type=int, default=100, help="approximate node count")
+    parser.add_argument('--queries', type=int, default=200,
+                        help="random (source, destination) pairs routed each round")
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--shards', type=int, default=4, help="asyncio tasks sharing the nodes")
+    parser.add_argument('--feedback', type=float, nargs='+', default=[1.0],
+                        help="probabilities of replying with an estimate per hop")
+    parser.add_argument('--max-steps', type=int, default=None,
+                        help="hop limit per packet (default: node count)")
+    parser.add_argument('--congestion', type=float, default=0.1,
+                        help="fraction of links to congest")
+    parser.add_argument('--tolerance', type=float, default=0.05,
+                        help="mean optimality gap counted as converged")
+    parser.add_argument('--stop-on-convergence', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    network = build_topology(args.topology, args.nodes, rng, args.congestion)
+    pairs = [tuple(rng.sample(network.nodes, 2)) for _ in range(args.queries)]
+    optimum = optimal_costs(network, pairs)
+
+    report = {
+        'config': vars(args),
+        'nodes': len(network.nodes),
+        'links': len(network.edges),
+        'results': [measure(network, pairs, optimum, feedback, args) for feedback in args.feedback],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,141 @@
+"""
+📼 Offline Q-learning from recorded transition logs
+
+Records (state, action, reward, next_state, destination) transitions into a
+TransitionLog while training online or simulating traffic, then retrains a
+fresh ArrayQLearningRouter from the log alone with batched updates and
+compares time and path quality against the online run.
+
+Run with: python replay_train.py --log traces/ --record-rounds 200 --output policy/
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from app import (METRICS, TOPOLOGIES, ArrayQLearningRouter, TrafficSimulator,
+                 TransitionLog, build_topology, load_topology, optimal_costs,
+                 path_quality)
+
+# =============================================================================
+# 1. RECORDING
+# =============================================================================
+
+def record_training(network, pairs, log, rounds, max_steps, seed):
+    """Train online with train_batch, recording every transition"""
+    router = ArrayQLearningRouter(network)
+    router.max_steps = max_steps
+    router.rng = np.random.default_rng(seed)
+    router.recorder = log
+    start = time.perf_counter()
+    router.train_batch(pairs, rounds)
+    seconds = time.perf_counter() - start
+    log.flush()
+    return router, seconds
+
+def record_traffic(network, pairs, log, duration, rate, seed):
+    """Simulate traffic over the pairs with the online router, recording every hop"""
+    router = ArrayQLearningRouter(network)
+    router.max_steps = len(network.nodes)
+    traffic = {pair: rate for pair in pairs}
+    simulator = TrafficSimulator(network, router, traffic, learners=[router],
+                                 recorder=log, seed=seed)
+    start = time.perf_counter()
+    simulator.run(duration)
+    seconds = time.perf_counter() - start
+    log.flush()
+    return router, seconds
+
+# =============================================================================
+# 2. OFFLINE TRAINING
+# =============================================================================
+
+def train_from_log(network, log, args):
+    """Fresh router trained only from the log"""
+    router = ArrayQLearningRouter(network)
+    router.max_steps = args.max_steps or len(network.nodes)
+    start = time.perf_counter()
+    result = router.train_offline(log, passes=args.passes, chunk_size=args.chunk_size,
+                                  batch_size=args.batch_size)
+    result['seconds'] = time.perf_counter() - start
+    return router, result
+
+# =============================================================================
+# 3. COMMAND LINE
+# =============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain Q-routing policies from transition logs")
+    parser.add_argument('--log', required=True, help="transition log directory (appended to)")
+    parser.add_argument('--network', help="topology file or directory (default: synthetic)")
+    parser.add_argument('--topology', choices=sorted(TOPOLOGIES), default='grid')
+    parser.add_argument('--nodes', type=int, default=100, help="approximate node count")
+    parser.add_argument('--queries', type=int, default=200,
+                        help="random (source, destination) pairs to record and evaluate")
+    parser.add_argument('--record-rounds', type=int, default=0,
+                        help="train_batch rounds to record before offline training")
+    parser.add_argument('--simulate', type=float, default=0,
+                        help="seconds of simulated traffic to record before offline training")
+    parser.add_argument('--rate', type=float, default=5.0, help="packets/second per pair")
+    parser.add_argument('--passes', type=int, default=1, help="passes over the log")
+    parser.add_argument('--chunk-size', type=int, default=1 << 20,
+                        help="records per memory-mapped read")
+    parser.add_argument('--batch-size', type=int, default=4096, help="records per Q update")
+    parser.add_argument('--max-steps', type=int, default=None,
+                        help="Q-learning hop limit (default: node count)")
+    parser.add_argument('--congestion', type=float, default=0.1,
+                        help="fraction of links to congest")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--metrics', action='store_true',
+                        help="collect router counters and timers")
+    parser.add_argument('--output', help="save the offline-trained router to this directory")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    METRICS.enabled = args.metrics
+    rng = random.Random(args.seed)
+    if args.network:
+        network = load_topology(args.network)
+    else:
+        network = build_topology(args.topology, args.nodes, rng, args.congestion)
+    pairs = [tuple(rng.sample(network.nodes, 2)) for _ in range(args.queries)]
+    optimum = optimal_costs(network, pairs)
+    max_steps = args.max_steps or len(network.nodes)
+
+    report = {'config': vars(args), 'nodes': len(network.nodes), 'links': len(network.edges)}
+    with TransitionLog(args.log) as log:
+        before = len(log)
+        online = None
+        if args.record_rounds:
+            online, seconds = record_training(network, pairs, log, args.record_rounds,
+                                              max_steps, args.seed)
+        elif args.simulate:
+            online, seconds = record_traffic(network, pairs, log, args.simulate,
+                                             args.rate, args.seed)
+        if online is not None:
+            report['online'] = {
+                'seconds': seconds,
+                'transitions_recorded': len(log) - before,
+                **path_quality(network, [online.find_best_path(s, d) for s, d in pairs], optimum),
+            }
+
+        router, result = train_from_log(network, log, args)
+        result['transitions_per_sec'] = (result['transitions'] / result['seconds']
+                                         if result['seconds'] else None)
+        result.update(path_quality(network, [router.find_best_path(s, d) for s, d in pairs],
+                                   optimum))
+        report['offline'] = result
+
+    if args.output:
+        router.save(args.output)
+    if args.metrics:
+        report['metrics'] = METRICS.to_dict()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
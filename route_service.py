@@ -0,0 +1,330 @@
+"""
+🛰️ Route-query service for the routing simulator
+
+Serves TraditionalRouter and Q-learning lookups plus congestion updates
+over TCP or a Unix socket, one JSON object per line:
+
+    {"op": "route", "router": "ai", "source": "A", "destination": "F"}
+    {"op": "route_many", "router": "traditional", "pairs": [["A", "F"], ["B", "E"]]}
+    {"op": "congest", "node1": "B", "node2": "D"}
+    {"op": "uncongest", "node1": "B", "node2": "D"}
+    {"op": "stats"}
+    {"op": "metrics", "format": "prometheus"}
+
+Concurrent route queries are coalesced into micro-batches answered with
+RoutingTable.route_many(). With --train the AI router keeps learning on
+its own copy of the topology in a background thread; AI queries are
+answered from the last route table it published, so lookups never wait
+for training.
+
+Run with: python route_service.py --port 8765 --train
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app import (METRICS, ArrayQLearningRouter, NetworkTopology, RoutingTable,
+                 TraditionalRouter, load_topology)
+
+log = logging.getLogger('routing.service')
+
+# =============================================================================
+# 1. MICRO-BATCHING
+# =============================================================================
+
+class RouteBatcher:
+    """Coalesce concurrent route queries for one router into bulk lookups.
+
+    The first query of a batch waits up to max_delay seconds for others to
+    join (or until max_batch queries are queued), then the whole batch is
+    answered with a single route_many() call, run on executor so it never
+    overlaps topology changes submitted to the same executor. table may be
+    swapped for a newer one at any time; each batch uses the table that was
+    current when it was flushed.
+    """
+
+    def __init__(self, table, executor, max_batch=1024, max_delay=0.002):
+        self.table = table
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = []  # (source ID, destination ID, future)
+        self.flush_handle = None
+        self.batches = 0
+        self.queries = 0
+
+    def submit(self, source, destination):
+        """Queue one query; returns a future resolving to (path, cost)"""
+        ids = self.table.network.node_ids
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((ids[source], ids[destination], future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+        return future
+
+    def flush(self):
+        """Answer every pending query with one route_many() call"""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+
+        table = self.table
+        pairs = np.array([(s, d) for s, d, _ in batch], dtype=np.int64)
+        lookup = asyncio.get_running_loop().run_in_executor(self.executor, table.route_many, pairs)
+        lookup.add_done_callback(lambda done: self._resolve(batch, table, done))
+
+    def _resolve(self, batch, table, lookup):
+        """Hand route_many() results (or its error) to the batch's futures"""
+        error = lookup.exception()
+        if error is not None:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        costs, hops = lookup.result()
+        self.batches += 1
+        self.queries += len(batch)
+        for (_, _, future), cost, row in zip(batch, costs.tolist(), hops):
+            if not future.done():
+                if cost == float('inf'):
+                    future.set_result((None, None))
+                else:
+                    future.set_result((table.path_names(row), cost))
+
+# =============================================================================
+# 2. SERVICE
+# =============================================================================
+
+class RouteService:
+    """Asyncio JSON-lines server in front of the simulator's routers"""
+
+    def __init__(self, network, train=False, train_rounds=5, max_batch=1024, max_delay=0.002,
+                 publish_interval=1.0, max_line=1 << 20):
+        self.network = network
+        self.max_line = max_line
+
+        # The AI router learns on its own copy of the topology, so training
+        # never holds up lookups; congestion changes reach it through a queue
+        self.training_network = NetworkTopology(network.nodes, network.edges)
+        for node1, node2 in network.congestion:
+            self.training_network.add_congestion(node1, node2)
+        self.routers = {
+            'traditional': TraditionalRouter(network),
+            'ai': ArrayQLearningRouter(self.training_network),
+        }
+        # Route lookups follow the router's full hop budget
+        self.routers['ai'].max_steps = len(network.nodes)
+        self.ai_table = RoutingTable(self.routers['ai'])  # Built on the training thread
+
+        # One worker thread owns the served network: route lookups and
+        # congestion changes run on it, never concurrently
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batchers = {
+            'traditional': RouteBatcher(RoutingTable(self.routers['traditional']),
+                                        self.executor, max_batch, max_delay),
+            'ai': RouteBatcher(self.ai_table.snapshot(network), self.executor,
+                               max_batch, max_delay),
+        }
+
+        self.train = train
+        self.train_rounds = train_rounds
+        self.train_pairs = list(itertools.permutations(network.nodes, 2))
+        self.publish_interval = publish_interval
+        self.published = 0  # AI route tables published since start
+        self.link_changes = queue.SimpleQueue()  # (method name, node1, node2) for the copy
+        self.stopping = threading.Event()
+        self.training_thread = None
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        """Start listening (and training, if enabled)"""
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self.handle_client, unix_path,
+                                                          limit=self.max_line)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host, port,
+                                                     limit=self.max_line)
+        if self.train:
+            self.training_thread = threading.Thread(target=self.train_forever, daemon=True)
+            self.training_thread.start()
+        return self.server
+
+    async def stop(self):
+        """Stop training and close the listener"""
+        self.stopping.set()
+        if self.training_thread:
+            await asyncio.to_thread(self.training_thread.join)
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    def train_forever(self, retry_delay=1.0):
+        """Keep training the AI router until stop(); runs on its own thread.
+
+        A fresh route table is published at most every publish_interval
+        seconds, since rebuilding it after every round would cost more than
+        the round itself. A failing round is logged and training resumes
+        after retry_delay seconds, so one error never silently stops learning.
+        """
+        router = self.routers['ai']
+        last_publish = time.monotonic()
+        while not self.stopping.is_set():
+            try:
+                self._apply_link_changes()
+                router.train_batch(self.train_pairs, self.train_rounds)
+                now = time.monotonic()
+                if now - last_publish >= self.publish_interval:
+                    self.publish()
+                    last_publish = now
+            except Exception:
+                log.exception("training round failed; retrying in %.1fs", retry_delay)
+                self.stopping.wait(retry_delay)
+
+    def _apply_link_changes(self):
+        """Replay queued congestion changes on the training copy"""
+        while True:
+            try:
+                method, node1, node2 = self.link_changes.get_nowait()
+            except queue.Empty:
+                return
+            getattr(self.training_network, method)(node1, node2)
+
+    def publish(self):
+        """Swap in a route table built from the AI router's current Q-values.
+
+        Runs on the training thread; the batcher picks the new table up with
+        one attribute assignment, so lookups see either the old or the new
+        table, never a half-built one.
+        """
+        self.batchers['ai'].table = self.ai_table.snapshot(self.network)
+        self.published += 1
+
+    async def run_on_network(self, function, *args):
+        """Run a topology change on the worker thread that owns the network"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def change_link(self, method, request):
+        """Apply add_congestion/remove_congestion to a link that must exist"""
+        node1, node2 = request['node1'], request['node2']
+        if node2 not in self.network.adjacency.get(node1, {}):
+            raise ValueError(f"no link {node1}-{node2}")
+        await self.run_on_network(getattr(self.network, method), node1, node2)
+        if self.train:
+            self.link_changes.put((method, node1, node2))
+
+    async def handle_client(self, reader, writer):
+        """Serve one connection: a JSON request per line, a JSON reply per line"""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than max_line: the rest of the line can't be framed
+                    reply = {'ok': False, 'error': f"request exceeds {self.max_line} bytes"}
+                    writer.write(json.dumps(reply).encode() + b'\n')
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    reply = await self.dispatch(json.loads(line))
+                except Exception as error:
+                    reply = {'ok': False, 'error': str(error)}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        """Run one request and build its reply"""
+        op = request.get('op')
+        if op == 'route':
+            batcher = self.batchers[request.get('router', 'traditional')]
+            path, cost = await batcher.submit(request['source'], request['destination'])
+            return {'ok': True, 'path': path, 'cost': cost}
+        if op == 'route_many':
+            batcher = self.batchers[request.get('router', 'traditional')]
+            results = await asyncio.gather(*(batcher.submit(s, d) for s, d in request['pairs']))
+            return {'ok': True, 'routes': [{'path': p, 'cost': c} for p, c in results]}
+        if op == 'congest':
+            await self.change_link('add_congestion', request)
+            return {'ok': True}
+        if op == 'uncongest':
+            await self.change_link('remove_congestion', request)
+            return {'ok': True}
+        if op == 'stats':
+            return {
+                'ok': True,
+                'training_episodes': self.routers['ai'].training_episodes,
+                'published_tables': self.published,
+                'congested_links': len(self.network.congestion) // 2,
+                'batches': {name: {'batches': b.batches, 'queries': b.queries}
+                            for name, b in self.batchers.items()},
+            }
+        if op == 'metrics':
+            if request.get('format') == 'prometheus':
+                return {'ok': True, 'text': METRICS.to_prometheus()}
+            return {'ok': True, 'enabled': METRICS.enabled, **METRICS.to_dict()}
+        raise ValueError(f"unknown op {op!r}")
+
+# =============================================================================
+# 3. COMMAND LINE
+# =============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve routing decisions over a socket")
+    parser.add_argument('--topology', help="topology file or directory (default: demo network)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--train', action='store_true',
+                        help="keep training the AI router in the background")
+    parser.add_argument('--max-batch', type=int, default=1024)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    parser.add_argument('--publish-interval', type=float, default=1.0,
+                        help="seconds between AI route table rebuilds while training")
+    parser.add_argument('--max-line', type=int, default=1 << 20,
+                        help="longest accepted request line in bytes")
+    parser.add_argument('--metrics', action='store_true',
+                        help="collect router counters and timers for the metrics op")
+    return parser.parse_args(argv)
+
+async def serve(args):
+    METRICS.enabled = args.metrics
+    network = load_topology(args.topology) if args.topology else NetworkTopology()
+    service = RouteService(network, train=args.train, max_batch=args.max_batch,
+                           max_delay=args.max_delay_ms / 1000,
+                           publish_interval=args.publish_interval, max_line=args.max_line)
+    server = await service.start(args.host, args.port, args.unix)
+    print(f"Serving routes on {args.unix or f'{args.host}:{args.port}'}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def main(argv=None):
+    try:
+        asyncio.run(serve(parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
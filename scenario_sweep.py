@@ -0,0 +1,488 @@
+"""
+🧪 Congestion what-if sweeps for the routing simulator
+
+Evaluates TraditionalRouter-style shortest paths (base costs), a trained
+ArrayQLearningRouter policy and the congestion-aware optimum for every
+source/destination pair under thousands of scenarios - e.g. every single
+and double link failure - on a process pool, streaming one summary row per
+scenario (or changed pairs with --per-pair) to CSV or Parquet.
+
+Per-destination results are computed once for the baseline network. A
+changed link only matters to the destinations whose routing tree or policy
+uses it, so each scenario is derived from the scenario one link smaller
+(cached, e.g. the single failure (a) for every double failure (a, b)) by
+recomputing just those columns.
+
+Run with: python scenario_sweep.py --topology grid --nodes 100 --failures 1 2 --output sweep.parquet
+"""
+
+import argparse
+import csv
+import itertools
+import multiprocessing
+import random
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app import (CONGESTION_MULTIPLIER, TOPOLOGIES, ArrayQLearningRouter, build_topology,
+                 dijkstra_tree, load_topology, train_lockstep)
+
+METHODS = ('traditional', 'q_learning', 'optimal')
+
+# Cost used for a failed link while a Q policy re-learns around it; a
+# finite penalty keeps the Bellman updates free of inf - inf
+FAILED_LINK_PENALTY = 1e9
+
+# =============================================================================
+# 1. SCENARIOS
+# =============================================================================
+
+def link_failures(network, sizes=(1,)):
+    """Every combination of `size` links for each size, as tuples of (u, v)"""
+    links = [(u, v) for u, v, _ in network.edges]
+    for size in sizes:
+        yield from itertools.combinations(links, size)
+
+def scenario_name(links):
+    return '|'.join(f"{u}-{v}" for u, v in links)
+
+# =============================================================================
+# 2. PER-DESTINATION ROUTING COLUMNS
+# =============================================================================
+
+def reverse_links(neighbors, degrees):
+    """For every node u, the (v, slot of u in v's row) links pointing at it"""
+    incoming = [[] for _ in range(len(degrees))]
+    for v in range(len(degrees)):
+        for slot in range(degrees[v]):
+            incoming[neighbors[v, slot]].append((v, slot))
+    return incoming
+
+def reverse_graph(incoming, cost_rows):
+    """incoming links weighted by per-slot costs, as dijkstra_tree() adjacency lists"""
+    return [[(v, cost_rows[v][slot]) for v, slot in links] for links in incoming]
+
+def tree_column(incoming, graph, destination):
+    """Dijkstra towards destination over reverse_graph(incoming, ...).
+
+    Returns (distance, next_hop, next_slot) arrays for every node; unreachable
+    nodes get distance inf and next hop -1.
+    """
+    distance, next_hop, via = dijkstra_tree(graph, destination)
+    next_slot = [incoming[u][k][1] if u >= 0 else 0 for u, k in zip(next_hop, via)]
+    return (np.array(distance), np.array(next_hop, dtype=np.int32),
+            np.array(next_slot, dtype=np.int32))
+
+def policy_costs(next_hop, next_slot, costs, destinations):
+    """Actual cost from every node to each destination along a next-hop table.
+
+    next_hop and next_slot hold one column per destination. Lanes that get
+    stuck or loop for more than nodes - 1 hops cost inf.
+    """
+    num_nodes, width = next_hop.shape
+    columns = np.broadcast_to(np.arange(width), (num_nodes, width))
+    targets = np.broadcast_to(destinations, (num_nodes, width))
+    current = np.repeat(np.arange(num_nodes)[:, None], width, axis=1)
+    total = np.zeros((num_nodes, width))
+    active = np.nonzero(current != targets)
+
+    for _ in range(num_nodes - 1):
+        if len(active[0]) == 0:
+            break
+        here, column = current[active], columns[active]
+        step = next_hop[here, column]
+        stuck = step < 0
+        total[active] += np.where(stuck, np.inf, costs[here, next_slot[here, column]])
+        # Stuck lanes jump to their target so they drop out
+        current[active] = np.where(stuck, targets[active], step)
+        keep = current[active] != targets[active]
+        active = (active[0][keep], active[1][keep])
+
+    total[active] = np.inf  # Routing loop
+    return total
+
+def q_columns(q_values, destinations, failed):
+    """Greedy next hops and slots of a Q policy, never using failed (node, slot) links"""
+    q = q_values[destinations]  # [destination, node, slot]
+    for node, slot in failed:
+        q[:, node, slot] = -np.inf
+    slots = np.argmax(q, axis=2).T.astype(np.int32)  # [node, destination]
+    dead = ~np.isfinite(q.max(axis=2)).T
+    return slots, dead
+
+# =============================================================================
+# 3. BASELINE AND SCENARIO EVALUATION
+# =============================================================================
+
+class RoutingState:
+    """Routes and costs of every method for one set of changed links"""
+
+    __slots__ = ('links', 'base_rows', 'cost_rows', 'costs', 'failed',
+                 'next_hop', 'next_slot', 'cost', 'columns')
+
+    def totals(self):
+        return {name: column.sum(axis=-1) for name, column in self.columns.items()}
+
+class SweepModel:
+    """Baseline routing columns plus incremental re-evaluation per scenario.
+
+    A scenario's state is derived from the state of the same scenario minus
+    its last link, recomputing only the destinations whose routing in that
+    parent uses the added link. The most recent states are cached, so in
+    itertools.combinations order every double failure (a, b) starts from
+    the already computed single failure (a).
+    """
+
+    def __init__(self, network, q_values, mode='fail', adapt_rounds=0,
+                 hyperparameters=None, seed=0, cache_size=4):
+        self.nodes = list(network.nodes)
+        self.node_ids = dict(network.node_ids)
+        self.neighbors, base_costs, self.degrees = network.get_link_arrays()
+        self.incoming = reverse_links(self.neighbors, self.degrees)
+        self.q_values = q_values
+        self.mode = mode
+        self.adapt_rounds = adapt_rounds
+        self.hyperparameters = hyperparameters
+        self.rng = np.random.default_rng(seed)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # links -> RoutingState
+        self._work = None  # Q copy re-trained per scenario, restored afterwards
+
+        state = RoutingState()
+        state.links = ()
+        state.base_rows = base_costs.tolist()
+        state.costs = network.get_actual_cost_array()
+        state.cost_rows = state.costs.tolist()
+        state.failed = []
+        everything = np.arange(len(self.nodes))
+        state.next_hop, state.next_slot, state.cost = self._route(state, everything, everything)
+        state.columns = self._aggregate(state.cost)
+        self.baseline = state
+
+    def _route(self, state, destinations, q_destinations, parent=None):
+        """(next_hop, next_slot, cost) dicts of the given columns under state"""
+        next_hop, next_slot, cost = {}, {}, {}
+        trad = destinations['traditional'] if isinstance(destinations, dict) else destinations
+        if parent is None or self.mode == 'fail':
+            next_hop['traditional'], next_slot['traditional'] = self._base_trees(
+                state.base_rows, trad)
+        else:
+            # Congestion leaves base costs, and so Dijkstra's routes, unchanged
+            next_hop['traditional'] = parent.next_hop['traditional'][:, trad]
+            next_slot['traditional'] = parent.next_slot['traditional'][:, trad]
+
+        optimal = destinations['optimal'] if isinstance(destinations, dict) else destinations
+        cost['optimal'], next_hop['optimal'] = self._optimal(state.cost_rows, optimal)
+        next_slot['optimal'] = None  # Costs come straight from Dijkstra
+
+        q_values = self._adapt(q_destinations, state.costs, state.failed)
+        next_hop['q_learning'], next_slot['q_learning'] = self._q_policy(
+            q_values, q_destinations, state.failed)
+        self._restore(q_destinations)
+
+        for method, columns in (('traditional', trad), ('q_learning', q_destinations)):
+            cost[method] = policy_costs(next_hop[method], next_slot[method],
+                                        state.costs, columns)
+        return next_hop, next_slot, cost
+
+    def _base_trees(self, base_rows, destinations):
+        """Base-cost shortest-path tree (next hops, slots) per destination"""
+        next_hop = np.full((len(self.nodes), len(destinations)), -1, dtype=np.int32)
+        next_slot = np.zeros_like(next_hop)
+        graph = reverse_graph(self.incoming, base_rows)
+        for column, destination in enumerate(destinations):
+            _, next_hop[:, column], next_slot[:, column] = tree_column(
+                self.incoming, graph, destination)
+        return next_hop, next_slot
+
+    def _optimal(self, cost_rows, destinations):
+        """Congestion-aware optimal costs and next hops per destination"""
+        cost = np.empty((len(self.nodes), len(destinations)))
+        next_hop = np.full(cost.shape, -1, dtype=np.int32)
+        graph = reverse_graph(self.incoming, cost_rows)
+        for column, destination in enumerate(destinations):
+            cost[:, column], next_hop[:, column], _ = tree_column(
+                self.incoming, graph, destination)
+        return cost, next_hop
+
+    def _q_policy(self, q_values, destinations, failed):
+        slots, dead = q_columns(q_values, destinations, failed)
+        next_hop = self.neighbors[np.arange(len(self.nodes))[:, None], slots]
+        next_hop[dead] = -1
+        return next_hop, slots
+
+    @staticmethod
+    def _aggregate(cost):
+        """Per-destination aggregates scenario summaries are built from.
+
+        [3, destination] rows per method (finite cost sum, reachable pairs,
+        unreachable pairs) and pairs where Q-learning beats Dijkstra.
+        """
+        columns = {}
+        for method in METHODS:
+            finite = np.isfinite(cost[method])
+            columns[method] = np.stack([np.where(finite, cost[method], 0).sum(axis=0),
+                                        finite.sum(axis=0) - 1,  # Minus the node itself
+                                        (~finite).sum(axis=0)])
+        columns['q_beats_traditional'] = (cost['q_learning'] < cost['traditional']).sum(axis=0)
+        return columns
+
+    def _slots(self, link):
+        """Both (node, slot) directions of a link"""
+        u, v = (self.node_ids[node] for node in link)
+        return [(u, int(np.flatnonzero(self.neighbors[u] == v)[0])),
+                (v, int(np.flatnonzero(self.neighbors[v] == u)[0]))]
+
+    def state(self, links):
+        """RoutingState of a scenario, derived from its cached parent"""
+        links = tuple(links)
+        if not links:
+            return self.baseline
+        if links in self._cache:
+            self._cache.move_to_end(links)
+            return self._cache[links]
+        state = self._derive(self.state(links[:-1]), links[-1])
+        self._cache[links] = state
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return state
+
+    def _derive(self, parent, link):
+        """parent's state with one more link failed or congested.
+
+        Scenarios only make links dearer or unusable, so destinations whose
+        routing in parent avoids the link keep their routes and costs.
+        """
+        slots = self._slots(link)
+        u, v = (self.node_ids[node] for node in link)
+
+        # Only the touched cost rows are copied
+        state = RoutingState()
+        state.links = parent.links + (link,)
+        state.base_rows, state.cost_rows = list(parent.base_rows), list(parent.cost_rows)
+        state.costs = parent.costs.copy()
+        for node, slot in slots:
+            state.base_rows[node] = list(state.base_rows[node])
+            state.cost_rows[node] = list(state.cost_rows[node])
+            if self.mode == 'fail':
+                state.base_rows[node][slot] = state.cost_rows[node][slot] = float('inf')
+            else:
+                state.cost_rows[node][slot] = self.baseline.base_rows[node][slot] * CONGESTION_MULTIPLIER
+            state.costs[node, slot] = state.cost_rows[node][slot]
+        state.failed = parent.failed + slots if self.mode == 'fail' else []
+
+        affected = {method: np.flatnonzero((next_hop[u] == v) | (next_hop[v] == u))
+                    for method, next_hop in parent.next_hop.items()}
+        next_hop, next_slot, cost = self._route(state, affected, affected['q_learning'], parent)
+
+        state.next_hop, state.next_slot, state.cost = {}, {}, {}
+        for method in METHODS:
+            columns = affected[method]
+            state.next_hop[method] = parent.next_hop[method].copy()
+            state.next_hop[method][:, columns] = next_hop[method]
+            if parent.next_slot[method] is not None:
+                state.next_slot[method] = parent.next_slot[method].copy()
+                state.next_slot[method][:, columns] = next_slot[method]
+            else:
+                state.next_slot[method] = None
+            state.cost[method] = parent.cost[method].copy()
+            state.cost[method][:, columns] = cost[method]
+
+        # Refresh the aggregates of every recomputed destination
+        changed = np.unique(np.concatenate(list(affected.values())))
+        partial = self._aggregate({method: state.cost[method][:, changed] for method in METHODS})
+        state.columns = {name: column.copy() for name, column in parent.columns.items()}
+        for name, column in partial.items():
+            state.columns[name][..., changed] = column
+        return state
+
+    def evaluate(self, links):
+        """Summary row of one scenario"""
+        state = self.state(links)
+        row = {'scenario': scenario_name(links), 'links': len(links)}
+        totals = state.totals()
+        for method in METHODS:
+            total = totals[method]
+            row[f'{method}_total_cost'] = float(total[0])
+            row[f'{method}_mean_cost'] = float(total[0] / total[1]) if total[1] else None
+            row[f'{method}_unreachable'] = int(total[2])
+        row['q_beats_traditional'] = int(totals['q_beats_traditional'])
+        return row
+
+    def _adapt(self, destinations, costs, failed):
+        """Q rows for destinations after adapt_rounds of re-training under the scenario"""
+        if not self.adapt_rounds or len(destinations) == 0:
+            return self.q_values
+        if self._work is None:
+            self._work = self.q_values.copy()
+        q_values = self._work
+        if failed:
+            costs = costs.copy()
+            for node, slot in failed:
+                costs[node, slot] = FAILED_LINK_PENALTY
+        num_nodes = len(self.nodes)
+        sources = np.tile(np.arange(num_nodes, dtype=np.int32), len(destinations))
+        targets = np.repeat(destinations.astype(np.int32), num_nodes)
+        keep = sources != targets
+        train_lockstep(q_values, self.neighbors, self.degrees, costs, sources[keep],
+                       targets[keep], self.adapt_rounds, self.hyperparameters, self.rng)
+        return q_values
+
+    def _restore(self, destinations):
+        """Undo _adapt() for the next scenario"""
+        if self._work is not None:
+            self._work[destinations] = self.q_values[destinations]
+
+    def changed_pairs(self, links):
+        """Per-pair rows for pairs whose cost differs from the baseline"""
+        state, name = self.state(links), scenario_name(links)
+        changed = np.zeros((len(self.nodes), len(self.nodes)), dtype=bool)
+        for method in METHODS:
+            changed |= state.cost[method] != self.baseline.cost[method]
+        for node, destination in zip(*np.nonzero(changed)):
+            row = {'scenario': name, 'source': self.nodes[node],
+                   'destination': self.nodes[destination]}
+            for method in METHODS:
+                row[f'{method}_cost'] = float(state.cost[method][node, destination])
+                row[f'{method}_baseline'] = float(self.baseline.cost[method][node, destination])
+            yield row
+
+# =============================================================================
+# 4. PROCESS POOL AND OUTPUT
+# =============================================================================
+
+_MODEL = None  # SweepModel of each pool worker
+_PER_PAIR = False
+
+def _init_worker(model, per_pair):
+    global _MODEL, _PER_PAIR
+    _MODEL, _PER_PAIR = model, per_pair
+
+def _evaluate_chunk(scenarios):
+    """Pool worker: rows for a chunk of scenarios"""
+    rows = []
+    for links in scenarios:
+        if _PER_PAIR:
+            rows.extend(_MODEL.changed_pairs(links))
+        else:
+            rows.append(_MODEL.evaluate(links))
+    return rows
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+class RowWriter:
+    """Stream row dicts to CSV, or to Parquet (needs pyarrow) by file extension"""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self._file = None
+        self._writer = None
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pylist(rows)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            if self._writer is None:
+                self._file = open(self.path, 'w', newline='')
+                self._writer = csv.DictWriter(self._file, fieldnames=list(rows[0]))
+                self._writer.writeheader()
+            self._writer.writerows(rows)
+
+    def close(self):
+        if self._writer is not None and self.parquet:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+def run_sweep(model, scenarios, path, processes=None, chunk_size=64, per_pair=False):
+    """Evaluate scenarios on a process pool, streaming rows to path.
+
+    Returns the number of rows written.
+    """
+    writer = RowWriter(path)
+    written = 0
+    try:
+        if processes == 1:
+            _init_worker(model, per_pair)
+            results = map(_evaluate_chunk, _chunks(scenarios, chunk_size))
+            for rows in results:
+                writer.write(rows)
+                written += len(rows)
+        else:
+            with multiprocessing.Pool(processes, initializer=_init_worker,
+                                      initargs=(model, per_pair)) as pool:
+                for rows in pool.imap(_evaluate_chunk, _chunks(scenarios, chunk_size)):
+                    writer.write(rows)
+                    written += len(rows)
+    finally:
+        writer.close()
+    return written
+
+# =============================================================================
+# 5. COMMAND LINE
+# =============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep link failure / congestion scenarios")
+    parser.add_argument('--topology', default='grid',
+                        help=f"one of {', '.join(sorted(TOPOLOGIES))}, or a topology file")
+    parser.add_argument('--nodes', type=int, default=100, help="approximate node count")
+    parser.add_argument('--congestion', type=float, default=0.0,
+                        help="fraction of links congested in the baseline")
+    parser.add_argument('--mode', choices=['fail', 'congest'], default='fail',
+                        help="what happens to the links of each scenario")
+    parser.add_argument('--failures', type=int, nargs='+', default=[1],
+                        help="numbers of simultaneously changed links to enumerate")
+    parser.add_argument('--limit', type=int, default=None, help="stop after this many scenarios")
+    parser.add_argument('--episodes', type=int, default=50,
+                        help="baseline Q-learning training rounds over all pairs")
+    parser.add_argument('--adapt-rounds', type=int, default=0,
+                        help="Q re-training rounds per scenario for affected destinations")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--per-pair', action='store_true',
+                        help="write one row per changed pair instead of per scenario")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='sweep.csv', help=".csv or .parquet file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    if args.topology in TOPOLOGIES:
+        network = build_topology(args.topology, args.nodes, rng, args.congestion)
+    else:
+        network = load_topology(args.topology)
+
+    start = time.perf_counter()
+    router = ArrayQLearningRouter(network)
+    router.max_steps = len(network.nodes)
+    router.rng = np.random.default_rng(args.seed)
+    router.train_batch(list(itertools.permutations(network.nodes, 2)), args.episodes)
+    model = SweepModel(network, router.q_values, args.mode, args.adapt_rounds,
+                       router._hyperparameters(), args.seed)
+    print(f"Baseline ready in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    scenarios = itertools.islice(link_failures(network, args.failures), args.limit)
+    start = time.perf_counter()
+    written = run_sweep(model, scenarios, args.output, args.processes,
+                        args.chunk_size, args.per_pair)
+    print(f"Wrote {written} rows to {args.output} in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
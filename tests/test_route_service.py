@@ -0,0 +1,65 @@
+"""Tests for the JSON-lines route service"""
+
+import asyncio
+import json
+
+from app import NetworkTopology
+from route_service import RouteService
+
+
+async def _session(service, lines):
+    """Send raw request lines to a running service; returns the decoded replies"""
+    server = await service.start(port=0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    replies = []
+    try:
+        for line in lines:
+            writer.write(line)
+            await writer.drain()
+            reply = await reader.readline()
+            if not reply:
+                break
+            replies.append(json.loads(reply))
+    finally:
+        writer.close()
+        await service.stop()
+    return replies
+
+
+def _request(**fields):
+    return json.dumps(fields).encode() + b'\n'
+
+
+def test_congest_rejects_unknown_links():
+    service = RouteService(NetworkTopology())
+    replies = asyncio.run(_session(service, [
+        _request(op='congest', node1='A', node2='F'),
+        _request(op='uncongest', node1='A', node2='Z'),
+        _request(op='congest', node1='A', node2='B'),
+    ]))
+    assert [reply['ok'] for reply in replies] == [False, False, True]
+    assert service.network.congestion == {('A', 'B'), ('B', 'A')}
+
+
+def test_oversized_request_gets_an_error_reply():
+    service = RouteService(NetworkTopology(), max_line=256)
+    replies = asyncio.run(_session(service, [b'{"op": "stats", "pad": "' + b'x' * 1024 + b'"}\n']))
+    assert len(replies) == 1 and not replies[0]['ok']
+
+
+def test_training_publishes_route_tables():
+    service = RouteService(NetworkTopology(), train=True, publish_interval=0.0)
+
+    async def run():
+        await service.start(port=0)
+        try:
+            while service.published == 0:
+                await asyncio.sleep(0.01)
+            return await service.dispatch({'op': 'route', 'router': 'ai',
+                                           'source': 'A', 'destination': 'F'})
+        finally:
+            await service.stop()
+
+    reply = asyncio.run(run())
+    assert reply['ok'] and reply['path'][-1] == 'F'
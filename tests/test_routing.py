@@ -0,0 +1,51 @@
+"""Regression tests for the routers on the demo network"""
+
+from app import (ArrayQLearningRouter, NetworkTopology, RoutingTable, TraditionalRouter,
+                 calculate_path_cost)
+
+
+def test_demo_dijkstra_path():
+    network = NetworkTopology()
+    router = TraditionalRouter(network)
+    path = router.find_shortest_path('A', 'F')
+    assert path == ['A', 'B', 'F']
+    assert calculate_path_cost(network, path) == 30
+
+
+def test_demo_dijkstra_path_ignores_congestion():
+    network = NetworkTopology()
+    network.add_congestion('A', 'B')
+    router = TraditionalRouter(network)
+    path = router.find_shortest_path('A', 'F')
+    assert path == ['A', 'B', 'F']
+    assert calculate_path_cost(network, path) == 50
+
+
+def test_incremental_dijkstra_matches_demo_path():
+    network = NetworkTopology()
+    router = TraditionalRouter(network, incremental=True)
+    assert router.find_shortest_path('A', 'F') == ['A', 'B', 'F']
+    network.add_congestion('A', 'B')
+    assert router.find_shortest_path('A', 'F') == ['A', 'B', 'F']
+
+
+def test_routing_table_same_source_and_destination():
+    network = NetworkTopology()
+    router = TraditionalRouter(network)
+    table = RoutingTable(router)
+    costs, hops = table.route_many([('A', 'A'), ('A', 'F')])
+    assert costs[0] == calculate_path_cost(network, router.find_path('A', 'A'))
+    assert table.path_names(hops[0]) == router.find_path('A', 'A') == ['A']
+    assert costs[1] == calculate_path_cost(network, router.find_path('A', 'F')) == 30
+
+
+def test_array_router_sweeps_removed_link():
+    network = NetworkTopology()
+    router = ArrayQLearningRouter(network, incremental=True)
+    router.warm_start()
+    assert router.find_path('A', 'F') == ['A', 'B', 'F']
+    before = router.get_q_value('A', 'B', 'F')
+
+    network.remove_link('B', 'F')
+    assert router.get_q_value('A', 'B', 'F') < before
+    assert router.find_path('A', 'F') == ['A', 'E', 'F']